@@ -1,9 +1,13 @@
 import streamlit as st
-import yfinance as yf
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
+from option_greeks import RISK_FREE_RATE, bs_gamma
+from option_chains import OptionChainCache
+
+GEX_MIN_YEARS = 0.001  # keeps the original 0.001-year floor, not option_greeks' one-hour MIN_YEARS
+PROFILE_POINTS = 500  # hypothetical spot prices in the gamma profile
 
 # Set page config
 st.set_page_config(
@@ -20,118 +24,161 @@ GEX helps understand potential price magnetism and resistance levels based on op
 """)
 
 def calculate_gamma(S, K, T, r, sigma, option_type='call'):
-    if T <= 0.001:
-        T = 0.001
-    
-    d1 = (np.log(S/K) + (r + sigma**2/2)*T) / (sigma*np.sqrt(T))
-    gamma = np.exp(-d1**2/2) / (S*sigma*np.sqrt(2*np.pi*T))
-    return gamma
+    # Gamma is the same for calls and puts; works on scalars or whole arrays of strikes
+    return bs_gamma(S, K, np.maximum(T, GEX_MIN_YEARS), r, sigma)
+
+def years_to_expiration(expirations, today=None):
+    today = today or datetime.now()
+    days = (pd.to_datetime(pd.Series(expirations)) - today).dt.days.to_numpy()
+    return np.maximum(days / 365, GEX_MIN_YEARS)
+
+@st.cache_resource
+def get_chain_cache():
+    """One chain cache per process, so reruns and sessions reuse downloads."""
+    return OptionChainCache()
 
-def find_best_expiration(ticker, min_days, max_days):
-    expirations = ticker.options
+def find_best_expiration(ticker_symbol, min_days, max_days):
+    cache = get_chain_cache()
     today = datetime.now()
-    
+
+    in_range = {}
+    for exp in cache.expirations(ticker_symbol):
+        days_to_exp = (datetime.strptime(exp, '%Y-%m-%d') - today).days
+        if min_days <= days_to_exp <= max_days:
+            in_range[exp] = days_to_exp
+
     best_oi = 0
     best_exp = None
-    
+
     expiration_data = []
-    for exp in expirations:
-        exp_date = datetime.strptime(exp, '%Y-%m-%d')
-        days_to_exp = (exp_date - today).days
-        
-        if min_days <= days_to_exp <= max_days:
-            try:
-                opt = ticker.option_chain(exp)
-                total_oi = opt.calls['openInterest'].sum() + opt.puts['openInterest'].sum()
-                expiration_data.append({
-                    'date': exp,
-                    'days': days_to_exp,
-                    'oi': total_oi
-                })
-                
-                if total_oi > best_oi:
-                    best_oi = total_oi
-                    best_exp = exp
-            except Exception as e:
-                st.warning(f"Error processing expiration {exp}: {str(e)}")
-                continue
-    
+    # Every chain in the window is downloaded concurrently, then summed in order
+    for exp, chain in cache.chains(ticker_symbol, in_range).items():
+        if isinstance(chain, Exception):
+            st.warning(f"Error processing expiration {exp}: {str(chain)}")
+            continue
+        calls, puts = chain
+        total_oi = calls['openInterest'].sum() + puts['openInterest'].sum()
+        expiration_data.append({
+            'date': exp,
+            'days': in_range[exp],
+            'oi': total_oi
+        })
+
+        if total_oi > best_oi:
+            best_oi = total_oi
+            best_exp = exp
+
     return best_exp, pd.DataFrame(expiration_data)
 
+def load_chain(ticker_symbol, expiration, current_price, price_range_pct):
+    """Calls and puts for one expiration within price_range_pct of the spot, with open interest."""
+    calls, puts = get_chain_cache().chain(ticker_symbol, expiration)
+
+    calls = calls[['strike', 'openInterest', 'impliedVolatility']].copy()
+    calls.loc[:, 'type'] = 'call'
+
+    puts = puts[['strike', 'openInterest', 'impliedVolatility']].copy()
+    puts.loc[:, 'type'] = 'put'
+
+    options_data = pd.concat([calls, puts], ignore_index=True)
+
+    # Filter strikes based on user-selected range
+    price_range = current_price * (price_range_pct / 100)
+    # Yahoo reports 0 IV for some illiquid contracts; their gamma is undefined and would turn every sum NaN
+    options_data = options_data[
+        (options_data['strike'] >= current_price - price_range) &
+        (options_data['strike'] <= current_price + price_range) &
+        (options_data['openInterest'] > 0) &
+        (options_data['impliedVolatility'] > 0)
+    ].dropna()
+    return options_data.assign(expiration=expiration)
+
+def compute_gex(options_data, current_price, r=RISK_FREE_RATE):
+    """GEX for every call and put in one array expression; puts count negative."""
+    T = years_to_expiration(options_data['expiration'])
+    strikes = options_data['strike'].to_numpy(np.float64)
+    oi = options_data['openInterest'].to_numpy(np.float64)
+    gamma = calculate_gamma(current_price, strikes, T, r, options_data['impliedVolatility'].to_numpy(np.float64))
+    sign = np.where(options_data['type'].to_numpy() == 'put', -1.0, 1.0)
+    return pd.DataFrame({
+        'strike': strikes,
+        'gex': sign * gamma * oi * current_price / 10000,
+        'oi': oi,
+        'type': options_data['type'].to_numpy(),
+        'expiration': options_data['expiration'].to_numpy(),
+    })
+
+def gex_matrix(gex_data):
+    """Strike × expiration GEX, plus a Total column aggregating the whole chain per strike."""
+    matrix = gex_data.pivot_table(index='strike', columns='expiration', values='gex', aggfunc='sum', fill_value=0.0)
+    matrix['Total'] = matrix.sum(axis=1)
+    return matrix
+
 def fetch_gex_data(ticker_symbol, expiration, price_range_pct, threshold):
     try:
-        ticker = yf.Ticker(ticker_symbol)
-        hist = ticker.history(period='5d')
-        if hist.empty:
-            raise ValueError(f"No price data available for {ticker_symbol}")
-        
-        current_price = hist['Close'].iloc[-1]
-        
-        exp_date = datetime.strptime(expiration, '%Y-%m-%d')
-        today = datetime.now()
-        T = max((exp_date - today).days / 365, 0.001)
-        
-        opt = ticker.option_chain(expiration)
-        
-        # Determine strike spacing
-        if current_price > 500:
-            strike_spacing = 5
-        elif current_price > 100:
-            strike_spacing = 2.5
-        else:
-            strike_spacing = 1
-            
-        calls = opt.calls[['strike', 'openInterest', 'impliedVolatility']].copy()
-        calls.loc[:, 'type'] = 'call'
-        
-        puts = opt.puts[['strike', 'openInterest', 'impliedVolatility']].copy()
-        puts.loc[:, 'type'] = 'put'
-        
-        # Filter strikes based on user-selected range
-        price_range = current_price * (price_range_pct / 100)
-        calls = calls[
-            (calls['strike'] >= current_price - price_range) & 
-            (calls['strike'] <= current_price + price_range)
-        ]
-        puts = puts[
-            (puts['strike'] >= current_price - price_range) & 
-            (puts['strike'] <= current_price + price_range)
-        ]
-        
-        calls = calls[calls['openInterest'] > 0].dropna()
-        puts = puts[puts['openInterest'] > 0].dropna()
-        
-        options_data = pd.concat([calls, puts])
-        
-        gex_data = []
-        for _, row in options_data.iterrows():
-            K = row['strike']
-            sigma = row['impliedVolatility']
-            oi = row['openInterest']
-            
-            gamma = calculate_gamma(current_price, K, T, 0.05, sigma)
-            gex = gamma * oi * current_price / 10000
-            if row['type'] == 'put':
-                gex = -gex
-            
-            gex_data.append({
-                'strike': K,
-                'gex': gex,
-                'oi': oi,
-                'type': row['type']
-            })
-        
-        df = pd.DataFrame(gex_data)
-        df['abs_gex'] = abs(df['gex'])
-        
-        filtered_df = df[df['abs_gex'] > threshold].drop('abs_gex', axis=1)
-        
+        current_price = get_chain_cache().spot(ticker_symbol)
+
+        options_data = load_chain(ticker_symbol, expiration, current_price, price_range_pct)
+        df = compute_gex(options_data, current_price).drop(columns='expiration')
+
+        filtered_df = df[df['gex'].abs() > threshold]
+
         return filtered_df, current_price
-        
+
     except Exception as e:
         st.error(f"Error processing {ticker_symbol}: {str(e)}")
         return pd.DataFrame(), None
 
+def fetch_chain_options(ticker_symbol, expirations, price_range_pct):
+    """Filtered calls and puts for several expirations, downloaded in one parallel round trip."""
+    try:
+        cache = get_chain_cache()
+        current_price = cache.spot(ticker_symbol)
+        cache.chains(ticker_symbol, expirations)  # warm every chain in parallel
+        chains = [load_chain(ticker_symbol, expiration, current_price, price_range_pct) for expiration in expirations]
+        return pd.concat(chains, ignore_index=True), current_price
+    except Exception as e:
+        st.error(f"Error processing {ticker_symbol}: {str(e)}")
+        return pd.DataFrame(), None
+
+def gex_profile(options_data, current_price, range_pct, points=PROFILE_POINTS, r=RISK_FREE_RATE):
+    """Total GEX at each of points spot prices within range_pct of current_price.
+
+    One spot × contract pass: gamma's 1/S cancels the S in GEX, and the 1/(sigma*sqrt(T))
+    and 1/sqrt(2*pi) factors fold into per-contract weights, so the total is pdf(d1) @ weights.
+    """
+    spots = np.linspace(current_price * (1 - range_pct / 100), current_price * (1 + range_pct / 100), points)
+    T = years_to_expiration(options_data['expiration'])
+    sigma = options_data['impliedVolatility'].to_numpy(np.float64)
+    sign = np.where(options_data['type'].to_numpy() == 'put', -1.0, 1.0)
+    vol_sqrt_t = sigma * np.sqrt(T)
+    weights = sign * options_data['openInterest'].to_numpy(np.float64) / (vol_sqrt_t * np.sqrt(2 * np.pi) * 10000)
+    offset = np.log(options_data['strike'].to_numpy(np.float64)) - (r + sigma * sigma / 2) * T
+
+    # d1 = (log S - offset) / (sigma sqrt T), built in place to keep one points × contracts buffer
+    d1 = np.subtract.outer(np.log(spots), offset)
+    d1 /= vol_sqrt_t
+    np.square(d1, out=d1)
+    d1 *= -0.5
+    np.exp(d1, out=d1)
+    return pd.DataFrame({'spot': spots, 'gex': d1 @ weights})
+
+def gamma_levels(profile, gex_data, current_price):
+    """Zero-gamma level nearest the spot (None if GEX never changes sign), call wall and put wall."""
+    spots, gex = profile['spot'].to_numpy(), profile['gex'].to_numpy()
+    crossings = np.flatnonzero(np.sign(gex[:-1]) * np.sign(gex[1:]) < 0)
+    zero_gamma = None
+    if crossings.size:
+        # Linear interpolation between the grid points either side of each sign change
+        left, right = spots[crossings], spots[crossings + 1]
+        levels = left - gex[crossings] * (right - left) / (gex[crossings + 1] - gex[crossings])
+        zero_gamma = float(levels[np.argmin(np.abs(levels - current_price))])
+
+    by_strike = gex_data.groupby(['type', 'strike'])['gex'].sum()
+    call_wall = by_strike['call'].idxmax() if 'call' in by_strike.index.get_level_values(0) else None
+    put_wall = by_strike['put'].idxmin() if 'put' in by_strike.index.get_level_values(0) else None
+    return zero_gamma, call_wall, put_wall
+
 def plot_gex(gex_data, current_price, ticker_symbol):
     if gex_data.empty:
         st.warning("No significant GEX values found for the selected parameters")
@@ -182,16 +229,13 @@ ticker_symbol = ticker_input.upper()
 
 if st.sidebar.button("Analyze"):
     try:
-        # Initialize ticker
-        ticker = yf.Ticker(ticker_symbol)
-        
         # Date range selection for expiration
         st.sidebar.subheader("Expiration Selection")
         min_days = st.sidebar.slider("Minimum Days to Expiration", 1, 30, 1)
         max_days = st.sidebar.slider("Maximum Days to Expiration", min_days, 60, 30)
         
         # Find best expiration
-        best_exp, exp_data = find_best_expiration(ticker, min_days, max_days)
+        best_exp, exp_data = find_best_expiration(ticker_symbol, min_days, max_days)
         
         if not best_exp:
             st.error("No suitable expiration dates found")
@@ -233,6 +277,23 @@ if st.sidebar.button("Analyze"):
                 # Display raw data in expandable section
                 with st.expander("View Raw GEX Data"):
                     st.dataframe(gex_data)
+
+            # GEX across every expiration in the selected window
+            chain_options, chain_price = fetch_chain_options(ticker_symbol, exp_data['date'].tolist(), price_range)
+            if not chain_options.empty:
+                chain_gex = compute_gex(chain_options, chain_price)
+
+                st.subheader("Gamma Profile")
+                profile = gex_profile(chain_options, chain_price, price_range)
+                zero_gamma, call_wall, put_wall = gamma_levels(profile, chain_gex, chain_price)
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Zero Gamma", f"${zero_gamma:.2f}" if zero_gamma is not None else "None in range")
+                col2.metric("Call Wall", f"${call_wall:.2f}" if call_wall is not None else "-")
+                col3.metric("Put Wall", f"${put_wall:.2f}" if put_wall is not None else "-")
+                st.line_chart(profile.set_index('spot'))
+
+                with st.expander("GEX by Strike and Expiration"):
+                    st.dataframe(gex_matrix(chain_gex).style.format("{:.1f}"))
             
     except Exception as e:
         st.error(f"Error analyzing {ticker_symbol}: {str(e)}")
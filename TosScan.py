@@ -1,28 +1,33 @@
 import streamlit as st
-import imaplib
-import email
-import re
 import datetime
 import pandas as pd
-from dateutil import parser
 import yfinance as yf
 import time
-from bs4 import BeautifulSoup
 from functools import lru_cache
 import logging
 from concurrent.futures import ThreadPoolExecutor
 from streamlit_extras.buy_me_a_coffee import button
+from streamlit_autorefresh import st_autorefresh
+from tos_alerts import (connect, get_mailbox_state, search_alert_uids, fetch_alerts, fetch_alerts_parallel, IdleListener,
+                        HighConvictionIndex, MARKET_TZ)
+from store_data import get_sync_state, save_email_alerts, load_email_alerts
 
 # Initialize session state at the very beginning
 def init_session_state():
-    if 'processed_email_ids' not in st.session_state:
-        st.session_state['processed_email_ids'] = set()
     if 'last_refresh_time' not in st.session_state:
         st.session_state['last_refresh_time'] = time.time()
     if 'cached_data' not in st.session_state:
         st.session_state['cached_data'] = {}
     if 'previous_symbols' not in st.session_state:
         st.session_state['previous_symbols'] = {}
+    if 'alerts' not in st.session_state:
+        st.session_state['alerts'] = {}
+    if 'alerts_since' not in st.session_state:
+        st.session_state['alerts_since'] = None
+    if 'hc_index' not in st.session_state:
+        st.session_state['hc_index'] = HighConvictionIndex()
+    if 'live_version' not in st.session_state:
+        st.session_state['live_version'] = 0
 
 # Call initialization immediately
 init_session_state()
@@ -38,6 +43,9 @@ EMAIL_PASSWORD = st.secrets["EMAIL_PASSWORD"]
 # Constants
 POLL_INTERVAL = 600  # 10 minutes in seconds
 SENDER_EMAIL = "alerts@thinkorswim.com"
+MAILBOX = 'inbox'
+MAX_LOOKBACK_DAYS = 90
+PARALLEL_BACKFILL_MIN_UIDS = 400  # below this one session is faster than opening more
 MAX_RETRIES = 3
 RETRY_DELAY = 2  # seconds
 
@@ -45,6 +53,10 @@ RETRY_DELAY = 2  # seconds
 Lower_timeframe_KEYWORDS = ["Long_VP", "Short_VP", "orb_bull", "orb_bear", "volume_scan", "A+Bull_30m", "tmo_long", "tmo_Short"]
 DAILY_KEYWORDS = ["Long_IT_volume", "Short_IT_volume", "bull_Daily_sqz", "bear_Daily_sqz", "LSMHG_Long", "LSMHG_Short"]
 OPTION_KEYWORDS = ["ETF_options", "UOP_Call"]
+ALL_KEYWORDS = Lower_timeframe_KEYWORDS + DAILY_KEYWORDS + OPTION_KEYWORDS
+
+STOCK_KEYWORDS = Lower_timeframe_KEYWORDS + DAILY_KEYWORDS
+HIGH_CONVICTION_IGNORE = ["tmo_long", "tmo_Short"]
 
 # Keyword definitions with added risk levels and descriptions
 KEYWORD_DEFINITIONS = {
@@ -174,135 +186,159 @@ def get_spy_qqq_prices():
 
 def connect_to_email(retries=MAX_RETRIES):
     """Establish email connection with retry logic."""
-    for attempt in range(retries):
-        try:
-            mail = imaplib.IMAP4_SSL('imap.gmail.com')
-            mail.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            return mail
-        except Exception as e:
-            if attempt == retries - 1:
-                raise
-            logger.warning(f"Connection attempt {attempt + 1} failed: {e}")
-            time.sleep(RETRY_DELAY)
+    return connect(EMAIL_ADDRESS, EMAIL_PASSWORD, retries=retries, retry_delay=RETRY_DELAY)
+
+def get_start_date(days_lookback):
+    """First calendar date included in the lookback window."""
+    today = datetime.date.today()
+    if days_lookback > 1:
+        return today - datetime.timedelta(days=days_lookback-1)
+    return today
 
-def parse_email_body(msg):
-    """Parse email body with better HTML handling."""
+def sync_alert_emails(sender_email, start_date):
+    """Download alerts newer than the stored UID high-water mark into the local alert store.
+
+    Only mail past the last synced UID is fetched, plus any older days when the lookback window
+    widens past what was synced before, so a refresh costs roughly the amount of new mail.
+    """
+    stored_uidvalidity, last_uid, synced_since = get_sync_state(EMAIL_ADDRESS, MAILBOX)
+
+    mail = connect_to_email()
     try:
-        if msg.is_multipart():
-            for part in msg.walk():
-                if part.get_content_type() in ["text/plain", "text/html"]:
-                    body = part.get_payload(decode=True).decode()
-                    if part.get_content_type() == "text/html":
-                        soup = BeautifulSoup(body, "html.parser", from_encoding='utf-8')
-                        return soup.get_text(separator=' ', strip=True)
-                    return body
+        uidvalidity, uidnext = get_mailbox_state(mail, MAILBOX)
+        mail.select(MAILBOX)
+
+        if uidvalidity != stored_uidvalidity:
+            # Mailbox was rebuilt; stored UIDs no longer identify the same messages
+            last_uid, synced_since = 0, None
+
+        if synced_since is None or last_uid == 0:
+            uids = search_alert_uids(mail, sender_email, start_date)
         else:
-            body = msg.get_payload(decode=True).decode()
-            if msg.get_content_type() == "text/html":
-                soup = BeautifulSoup(body, "html.parser", from_encoding='utf-8')
-                return soup.get_text(separator=' ', strip=True)
-            return body
-    except Exception as e:
-        logger.error(f"Error parsing email body: {e}")
-        return ""
+            uids = search_alert_uids(mail, sender_email, min_uid=last_uid + 1)
+            if start_date < synced_since:
+                uids += search_alert_uids(mail, sender_email, start_date, before_date=synced_since)
+
+        parallel = len(uids) >= PARALLEL_BACKFILL_MIN_UIDS
+        if not parallel:
+            rows = fetch_alerts(mail, uids, ALL_KEYWORDS, start_date)
+    finally:
+        try:
+            mail.close()
+        finally:
+            mail.logout()
+
+    if parallel:
+        # Long lookbacks: spread the backfill across several sessions
+        rows = fetch_alerts_parallel(EMAIL_ADDRESS, EMAIL_PASSWORD, uids, ALL_KEYWORDS, start_date, mailbox=MAILBOX)
+
+    high_water = max([uidnext - 1, last_uid] + uids)
+    synced_since = start_date if synced_since is None else min(start_date, synced_since)
+    save_email_alerts(EMAIL_ADDRESS, MAILBOX, uidvalidity, high_water, synced_since, rows)
+
+def load_alerts(sender_email, days_lookback):
+    """Return alerts in the lookback window grouped by scan, reusing the window this session already holds.
+
+    A narrower window is filtered from the cached one in memory; a wider one loads only the missing
+    older days and merges them in. Returns a dict of scan -> list of (symbol, scan, email_datetime).
+    """
+    start_date = get_start_date(days_lookback)
+    alerts = st.session_state['alerts']
+    cached_since = st.session_state['alerts_since']
+
+    if cached_since is None or start_date < cached_since:
+        sync_alert_emails(sender_email, start_date)
+
+        older = {keyword: [] for keyword in ALL_KEYWORDS}
+        for symbol, scan, email_datetime in load_email_alerts(EMAIL_ADDRESS, MAILBOX, start_date, before_date=cached_since):
+            if scan in older:
+                # The store keeps fixed UTC offsets; one zone keeps pandas columns tz-aware across DST
+                older[scan].append((symbol, scan, email_datetime.astimezone(MARKET_TZ)))
+        index_stock_alerts(alert for scan_alerts in older.values() for alert in scan_alerts)
+
+        for keyword in ALL_KEYWORDS:
+            alerts[keyword] = older[keyword] + alerts.get(keyword, [])
+        st.session_state['alerts_since'] = cached_since = start_date
+
+    if start_date == cached_since:
+        return alerts
+    return {scan: [alert for alert in scan_alerts if alert[2].date() >= start_date]
+            for scan, scan_alerts in alerts.items()}
+
+def is_stock_symbol(symbol):
+    return symbol.isalpha() and symbol.isupper()
+
+def index_stock_alerts(alerts):
+    """Add (symbol, scan, email_datetime) stock alerts to this session's high-conviction index."""
+    st.session_state['hc_index'].add(
+        alert for alert in alerts if alert[1] in STOCK_KEYWORDS and is_stock_symbol(alert[0])
+    )
+
+def persist_live_alerts(uidvalidity, last_uid, rows):
+    """Write alerts pushed by the IDLE listener to the local store so new sessions start from them."""
+    _, _, synced_since = get_sync_state(EMAIL_ADDRESS, MAILBOX)
+    save_email_alerts(EMAIL_ADDRESS, MAILBOX, uidvalidity, last_uid, synced_since, rows)
+
+@st.cache_resource
+def get_alert_listener():
+    """Start the process-wide IMAP IDLE listener once; every session reads its buffer."""
+    uidvalidity, last_uid, _ = get_sync_state(EMAIL_ADDRESS, MAILBOX)
+    listener = IdleListener(
+        EMAIL_ADDRESS, EMAIL_PASSWORD, SENDER_EMAIL, ALL_KEYWORDS,
+        mailbox=MAILBOX,
+        start_state=(uidvalidity, last_uid) if uidvalidity is not None else None,
+        on_alerts=persist_live_alerts,
+    )
+    listener.start()
+    return listener
+
+def merge_live_alerts():
+    """Fold alerts pushed since this session last looked into its alerts and drop stale keyword tables."""
+    new_alerts, version = get_alert_listener().buffer.since(st.session_state['live_version'])
+    st.session_state['live_version'] = version
+
+    alerts = st.session_state['alerts']
+    if not alerts:
+        # Nothing loaded yet; the next load reads the store the listener already wrote to
+        return
+    index_stock_alerts((symbol, scan, email_datetime) for _, symbol, scan, email_datetime in new_alerts)
+    for _, symbol, scan, email_datetime in new_alerts:
+        if scan in alerts:
+            alerts[scan].append((symbol, scan, email_datetime))
+            for key in [key for key in st.session_state['cached_data'] if key[0] == scan]:
+                del st.session_state['cached_data'][key]
 
 def extract_stock_symbols_from_email(email_address, password, sender_email, keyword, days_lookback):
     """Extract stock symbols from email alerts with proper date filtering."""
-    # Check if this data is already in cache
-    if keyword in st.session_state['cached_data']:
-        return st.session_state['cached_data'][keyword]
+    # Check if this data is already in cache for the same window
+    cache_key = (keyword, get_start_date(days_lookback))
+    if cache_key in st.session_state['cached_data']:
+        return st.session_state['cached_data'][cache_key]
 
     try:
-        mail = connect_to_email()
-        mail.select('inbox')
-
-        # Calculate the start date based on days_lookback
-        today = datetime.date.today()
-        start_date = today
-        if days_lookback > 1:
-            start_date = today - datetime.timedelta(days=days_lookback-1)
-        
-        date_since = start_date.strftime("%d-%b-%Y")
-        search_criteria = f'(FROM "{sender_email}" SUBJECT "{keyword}" SINCE "{date_since}")'
-        _, data = mail.search(None, search_criteria)
-
         stock_data = []
-        
-        for num in data[0].split():
-            if num in st.session_state['processed_email_ids']:
-                continue
 
-            _, data = mail.fetch(num, '(RFC822)')
-            msg = email.message_from_bytes(data[0][1])
-            
-            # Parse the email datetime
-            email_datetime = parser.parse(msg['Date'])
-            email_date = email_datetime.date()
-            
-            # Skip if email date is before start_date
-            if email_date < start_date:
-                continue
-                
-            # Skip weekends
-            if email_datetime.weekday() >= 5:
-                continue
-
-            body = parse_email_body(msg)
-            symbols = re.findall(r'New symbols:\s*([A-Z,\s]+)\s*were added to\s*(' + re.escape(keyword) + ')', body)
-            
-            if symbols:
-                for symbol_group in symbols:
-                    extracted_symbols = symbol_group[0].replace(" ", "").split(",")
-                    signal_type = symbol_group[1]
-                    for symbol in extracted_symbols:
-                        if symbol.isalpha():  # Basic symbol validation
-                            stock_data.append([symbol, email_datetime, signal_type])
-            
-            st.session_state['processed_email_ids'].add(num)
-
-        mail.close()
-        mail.logout()
+        for symbol, signal_type, email_datetime in load_alerts(sender_email, days_lookback)[keyword]:
+            if is_stock_symbol(symbol):  # Basic symbol validation
+                stock_data.append([symbol, email_datetime, signal_type])
 
         if stock_data:
             df = pd.DataFrame(stock_data, columns=['Ticker', 'Date', 'Signal'])
             df = df.sort_values(by=['Date', 'Ticker']).drop_duplicates(subset=['Ticker', 'Signal', 'Date'], keep='last')
             
             # Cache the data for this keyword
-            st.session_state['cached_data'][keyword] = df
+            st.session_state['cached_data'][cache_key] = df
             return df
 
         # Cache empty DataFrame if no data found
-        st.session_state['cached_data'][keyword] = pd.DataFrame(columns=['Ticker', 'Date', 'Signal'])
-        return st.session_state['cached_data'][keyword]
+        st.session_state['cached_data'][cache_key] = pd.DataFrame(columns=['Ticker', 'Date', 'Signal'])
+        return st.session_state['cached_data'][cache_key]
 
     except Exception as e:
         logger.error(f"Error in extract_stock_symbols_from_email: {e}")
         st.error(f"Error processing emails: {str(e)}")
         return pd.DataFrame(columns=['Ticker', 'Date', 'Signal'])
 
-def high_conviction_stocks(dataframes, ignore_keywords=None):
-    """Find stocks with high conviction - at least two unique keyword matches on the same date."""
-    if ignore_keywords is None:
-        ignore_keywords = []
-    
-    # Filter out the ignored keywords before processing
-    filtered_dataframes = [df[~df['Signal'].isin(ignore_keywords)] for df in dataframes if not df.empty]
-    
-    all_data = pd.concat(filtered_dataframes, ignore_index=True)
-    
-    # Convert datetime to date for grouping in high conviction
-    all_data['Date'] = all_data['Date'].dt.date
-    
-    # Aggregate using set to ensure unique signals
-    grouped = all_data.groupby(['Date', 'Ticker'])['Signal'].agg(lambda x: ', '.join(set(x))).reset_index()
-    
-    # Count unique signals
-    grouped['Count'] = grouped['Signal'].apply(lambda x: len(x.split(', ')))
-    
-    high_conviction = grouped[grouped['Count'] >= 2][['Date', 'Ticker', 'Signal']]
-    
-    return high_conviction
-
 def get_new_symbols_count(keyword, current_df):
     if current_df.empty:
         print(f"⚠️ Warning: DataFrame is empty for keyword: {keyword}")
@@ -337,107 +373,58 @@ def get_new_symbols_count(keyword, current_df):
     
     return len(new_symbols)
 
-def parse_option_symbol(option_symbol):
-    try:
-        # Remove leading dot if present
-        symbol = option_symbol.lstrip('.')
-        
-        # Extract components using regex
-        pattern = r'([A-Z]+)(\d{2})(\d{2})(\d{2})([CP])([\d_]+)'
-        match = re.match(pattern, symbol)
-        
-        if match:
-            Ticker, year, month, day, opt_type, strike = match.groups()
-            
-            # Convert month number to month abbreviation
-            month_name = datetime.datetime.strptime(month, '%m').strftime('%b').upper()
-            
-            # Format strike price (replace underscore with a decimal point)
-            strike = strike.replace('_', '.')
-            
-            # Determine if it's a CALL or PUT
-            option_type = 'CALL' if opt_type == 'C' else 'PUT'
-            
-            return f"{Ticker} {day} {month_name} 20{year} {strike} {option_type}"
-    
-    except Exception as e:
-        logger.error(f"Error parsing option symbol {option_symbol}: {e}")
+# Thinkorswim writes fractional strikes with a dot (.AAPL250117C182.5), older alerts with an underscore
+OPTION_SYMBOL_PATTERN = r'^([A-Z]+)(\d{2})(\d{2})(\d{2})([CP])([\d_]+(?:\.\d+)?)'
+OPTION_COLUMNS = ['Raw_Symbol', 'Readable_Symbol', 'Underlying', 'Expiry', 'Type', 'Strike', 'Date', 'Signal']
 
-    return option_symbol
-    
+def decode_option_symbols(symbols):
+    """Decode a Series of OCC/Thinkorswim option symbols in one vectorized pass.
 
-def extract_option_symbols_from_email(email_address, password, sender_email, keyword, days_lookback):
-    """Extract option symbols from email alerts with proper date filtering."""
-    # Check cache
-    if keyword in st.session_state['cached_data']:
-        return st.session_state['cached_data'][keyword]
+    Returns a frame aligned with symbols holding Underlying, Expiry (datetime), Type (CALL/PUT),
+    Strike (float) and Readable_Symbol; symbols that do not parse keep their raw text as Readable_Symbol.
+    """
+    parts = symbols.str.lstrip('.').str.extract(OPTION_SYMBOL_PATTERN)
+    parts.columns = ['underlying', 'year', 'month', 'day', 'type', 'strike']
 
-    try:
-        mail = connect_to_email()
-        mail.select('inbox')
-
-        # Calculate the start date based on days_lookback
-        today = datetime.date.today()
-        start_date = today
-        if days_lookback > 1:
-            start_date = today - datetime.timedelta(days=days_lookback-1)
-            
-        date_since = start_date.strftime("%d-%b-%Y")
-        search_criteria = f'(FROM "{sender_email}" SUBJECT "{keyword}" SINCE "{date_since}")'
-        _, data = mail.search(None, search_criteria)
+    strike_text = parts['strike'].str.replace('_', '.', regex=False)
+    decoded = pd.DataFrame({
+        'Underlying': parts['underlying'],
+        'Expiry': pd.to_datetime(parts['year'] + parts['month'] + parts['day'], format='%y%m%d', errors='coerce'),
+        'Type': parts['type'].map({'C': 'CALL', 'P': 'PUT'}),
+        'Strike': pd.to_numeric(strike_text, errors='coerce'),
+    }, index=symbols.index)
 
-        option_data = []
-        
-        for num in data[0].split():
-            if num in st.session_state['processed_email_ids']:
-                continue
+    readable = (decoded['Underlying'] + ' ' + decoded['Expiry'].dt.strftime('%d %b %Y').str.upper()
+                + ' ' + strike_text + ' ' + decoded['Type'])
+    decoded.insert(0, 'Readable_Symbol', readable.fillna(symbols))
+    return decoded
 
-            _, data = mail.fetch(num, '(RFC822)')
-            msg = email.message_from_bytes(data[0][1])
-            
-            # Parse the email datetime
-            email_datetime = parser.parse(msg['Date'])
-            email_date = email_datetime.date()
-            
-            # Skip if email date is before start_date
-            if email_date < start_date:
-                continue
-                
-            # Skip weekends
-            if email_datetime.weekday() >= 5:
-                continue
-
-            body = parse_email_body(msg)
-            symbols = re.findall(r'New symbols:\s*([\.\w,\s]+)\s*were added to\s*(' + re.escape(keyword) + ')', body)
-            
-            if symbols:
-                for symbol_group in symbols:
-                    extracted_symbols = symbol_group[0].replace(" ", "").split(",")
-                    signal_type = symbol_group[1]
-                    for symbol in extracted_symbols:
-                        if symbol:  # Basic validation
-                            readable_symbol = parse_option_symbol(symbol)
-                            option_data.append([symbol, readable_symbol, email_datetime, signal_type])
-            
-            st.session_state['processed_email_ids'].add(num)
+def extract_option_symbols_from_email(email_address, password, sender_email, keyword, days_lookback):
+    """Extract option symbols from email alerts with proper date filtering."""
+    # Check cache for the same window
+    cache_key = (keyword, get_start_date(days_lookback))
+    if cache_key in st.session_state['cached_data']:
+        return st.session_state['cached_data'][cache_key]
 
-        mail.close()
-        mail.logout()
+    try:
+        option_data = [[symbol, email_datetime, signal_type]
+                       for symbol, signal_type, email_datetime in load_alerts(sender_email, days_lookback)[keyword]]
 
         if option_data:
-            df = pd.DataFrame(option_data, columns=['Raw_Symbol', 'Readable_Symbol', 'Date', 'Signal'])
+            df = pd.DataFrame(option_data, columns=['Raw_Symbol', 'Date', 'Signal'])
             df = df.sort_values(by=['Date', 'Raw_Symbol']).drop_duplicates(subset=['Raw_Symbol', 'Signal', 'Date'], keep='last')
+            df = pd.concat([df, decode_option_symbols(df['Raw_Symbol'])], axis=1)[OPTION_COLUMNS]
             
-            st.session_state['cached_data'][keyword] = df
+            st.session_state['cached_data'][cache_key] = df
             return df
 
-        st.session_state['cached_data'][keyword] = pd.DataFrame(columns=['Raw_Symbol', 'Readable_Symbol', 'Date', 'Signal'])
-        return st.session_state['cached_data'][keyword]
+        st.session_state['cached_data'][cache_key] = pd.DataFrame(columns=OPTION_COLUMNS)
+        return st.session_state['cached_data'][cache_key]
 
     except Exception as e:
         logger.error(f"Error in extract_option_symbols_from_email: {e}")
         st.error(f"Error processing emails: {str(e)}")
-        return pd.DataFrame(columns=['Raw_Symbol', 'Readable_Symbol', 'Date', 'Signal'])
+        return pd.DataFrame(columns=OPTION_COLUMNS)
 
 def render_options_section(keyword, days_lookback):
     """Helper function to render options section content"""
@@ -465,8 +452,10 @@ def render_options_section(keyword, days_lookback):
                 st.info(f"Suggested Stop: {info.get('suggested_stop', 'N/A')}")
         
         if not symbols_df.empty:
-            display_df = symbols_df.copy()
+            sort_by = st.selectbox("Sort by", ["Date", "Expiry", "Strike"], key=f"{keyword}_sort")
+            display_df = symbols_df.sort_values(by=[sort_by, 'Date'], ascending=sort_by != "Date")
             display_df['Date'] = display_df['Date'].dt.strftime('%Y-%m-%d %H:%M:%S')
+            display_df['Expiry'] = display_df['Expiry'].dt.strftime('%Y-%m-%d')
             display_df = display_df.drop('Raw_Symbol', axis=1)
             st.dataframe(display_df, use_container_width=True)
             
@@ -537,14 +526,16 @@ def main():
         days_lookback = st.slider(
             "Days to Look Back",
             min_value=1,
-            max_value=3,
+            max_value=MAX_LOOKBACK_DAYS,
             value=1,
             help="Choose how many days of historical alerts to analyze"
         )
         
-        auto_refresh = st.checkbox("Enable Auto-refresh", value=False)
+        auto_refresh = st.checkbox("Enable Auto-refresh", value=True,
+                                   help="Re-render as alerts are pushed by the mailbox listener; does not re-poll email")
         if auto_refresh:
-            refresh_interval = st.slider("Refresh Interval (minutes)", 1, 30, 10)
+            refresh_interval = st.slider("Refresh Interval (seconds)", 5, 300, 15)
+            st_autorefresh(interval=refresh_interval * 1000, key="alerts_autorefresh")
         
         st.markdown("---")
         button(username="tosalerts33", floating=False, width=221)
@@ -572,17 +563,13 @@ def main():
     with col3:
         if st.button("🔄 Refresh Data"):
             st.session_state['cached_data'].clear()
-            st.session_state['processed_email_ids'].clear()
+            st.session_state['alerts'].clear()
+            st.session_state['alerts_since'] = None
+            st.session_state['hc_index'] = HighConvictionIndex()
             st.rerun()
 
-    # Auto-refresh logic
-    if auto_refresh and st.session_state['last_refresh_time']:
-        time_since_refresh = time.time() - st.session_state['last_refresh_time']
-        if time_since_refresh >= refresh_interval * 60:
-            st.session_state['cached_data'].clear()
-            st.session_state['processed_email_ids'].clear()
-            st.session_state['last_refresh_time'] = time.time()
-            st.rerun()
+    # Pick up alerts pushed by the IDLE listener since the last render
+    merge_live_alerts()
 
     # Scan type selection
     section = st.radio("Select View", ["Lower_timeframe", "Daily", "High Conviction", "Live Options"], 
@@ -605,21 +592,19 @@ def main():
             
     elif section == "High Conviction":
         st.subheader("High Conviction Scans")
-        all_signals = []
-        
-        # Collect all signals from both Lower_timeframe and Daily scans
-        for keyword in Lower_timeframe_KEYWORDS + DAILY_KEYWORDS:
-            df = extract_stock_symbols_from_email(
-                EMAIL_ADDRESS, EMAIL_PASSWORD, SENDER_EMAIL, keyword, days_lookback
-            )
-            if not df.empty:
-                all_signals.append(df)
+        try:
+            load_alerts(SENDER_EMAIL, days_lookback)
+        except Exception as e:
+            # Show the error and fall through to whatever the index already holds
+            logger.error(f"Error loading alerts for high conviction: {e}")
+            st.error(f"Error processing emails: {str(e)}")
+        hc_index = st.session_state['hc_index']
         
-        if all_signals:
+        if len(hc_index):
             # Ignore tmo_long and tmo_Short for High Conviction
-            high_conviction_df = high_conviction_stocks(
-                all_signals, 
-                ignore_keywords=["tmo_long", "tmo_Short"]
+            high_conviction_df = hc_index.high_conviction(
+                [keyword for keyword in STOCK_KEYWORDS if keyword not in HIGH_CONVICTION_IGNORE],
+                since_date=get_start_date(days_lookback)
             )
             
             if not high_conviction_df.empty:
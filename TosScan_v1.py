@@ -8,7 +8,7 @@ import pandas as pd
 from dateutil import parser
 import yfinance as yf
 import time
-from bs4 import BeautifulSoup
+from tos_alerts import parse_email_body
 
 # Fetch credentials from Streamlit Secrets
 EMAIL_ADDRESS = st.secrets["EMAIL_ADDRESS"]
@@ -73,25 +73,7 @@ def extract_stock_symbols_from_email(email_address, password, sender_email, keyw
             if email_date.weekday() >= 5:  # Skip weekends
                 continue
 
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain":
-                        # Plain text version of the email
-                        body = part.get_payload(decode=True).decode()
-                    elif part.get_content_type() == "text/html":
-                        # HTML version of the email
-                        html_body = part.get_payload(decode=True).decode()
-                        # Use BeautifulSoup to extract text from HTML
-                        soup = BeautifulSoup(html_body, "html.parser")
-                        body = soup.get_text()
-            else:
-                # If the email is not multipart, check if it's HTML
-                if msg.get_content_type() == "text/html":
-                    html_body = msg.get_payload(decode=True).decode()
-                    soup = BeautifulSoup(html_body, "html.parser")
-                    body = soup.get_text()
-                else:
-                    body = msg.get_payload(decode=True).decode()
+            body = parse_email_body(msg)
 
             # Extract symbols using regex
             symbols = re.findall(r'New symbols:\s*([A-Z,\s]+)\s*were added to\s*(' + re.escape(keyword) + ')', body)
@@ -1,30 +1,30 @@
 import streamlit as st
 from streamlit_extras.buy_me_a_coffee import button
-import imaplib
-import email
-import re
+from streamlit_autorefresh import st_autorefresh
 import datetime
 import pandas as pd
-from dateutil import parser
 import yfinance as yf
-import time
-from bs4 import BeautifulSoup
-from store_data import store_data, fetch_data
+from tos_alerts import connect, get_mailbox_state, search_alert_uids, fetch_alerts, IdleListener, MARKET_TZ
+from store_data import (get_writer, fetch_data, count_data, iter_data, fetch_high_conviction,
+                        get_sync_state, save_email_alerts, load_email_alerts)
 
 # Fetch credentials from Streamlit Secrets
 EMAIL_ADDRESS = st.secrets["EMAIL_ADDRESS"]
 EMAIL_PASSWORD = st.secrets["EMAIL_PASSWORD"]
 
 # Constants
-POLL_INTERVAL = 600  # 10 minutes in seconds
+POLL_INTERVAL = 600  # seconds between re-renders; new alerts arrive through the IDLE listener
 SENDER_EMAIL = "alerts@thinkorswim.com"
+MAILBOX = 'inbox'
+LOOKBACK_DAYS = 2
+# This dashboard syncs fewer scans than TosScan, so it keeps its own UID high-water mark in the store
+SYNC_ACCOUNT = f"{EMAIL_ADDRESS}#app"
+PAGE_SIZE = 50  # stored alerts shown per page
+WRITE_WAIT = 2  # seconds a render waits for its alerts to be committed
 
 # Keywords to search for in email subjects
 KEYWORDS = ["volume_scan", "A+Bull_30m", "tmo_long", "tmo_Short", "Long_IT_volume", "Short_IT_volume", "bull_Daily_sqz", "bear_Daily_sqz"]  # Add more keywords as needed
 
-# Track processed email IDs to avoid duplicates
-processed_email_ids = set()
-
 # Custom Tooltip descriptions for each keyword
 TOOLTIPS = {
     "volume_scan": {
@@ -44,95 +44,107 @@ def get_spy_qqq_prices():
     
     return spy_price, qqq_price
 
-def extract_stock_symbols_from_email(email_address, password, sender_email, keyword):
+def sync_alert_emails(start_date):
+    """Fetch alerts past the stored UID mark, or since start_date on first run, into the local store."""
+    stored_uidvalidity, last_uid, synced_since = get_sync_state(SYNC_ACCOUNT, MAILBOX)
+    mail = connect(EMAIL_ADDRESS, EMAIL_PASSWORD)
     try:
-        mail = imaplib.IMAP4_SSL('imap.gmail.com')
-        mail.login(email_address, password)
-        mail.select('inbox')
-
-        date_since = (datetime.date.today() - datetime.timedelta(days=2)).strftime("%d-%b-%Y")
-        search_criteria = f'(FROM "{sender_email}" SUBJECT "{keyword}" SINCE "{date_since}")'
-        _, data = mail.search(None, search_criteria)
-
-        stock_data = []
-        for num in data[0].split():
-            if num in processed_email_ids:
-                continue  # Skip already processed emails
-
-            _, data = mail.fetch(num, '(RFC822)')
-            msg = email.message_from_bytes(data[0][1])
-            email_date = parser.parse(msg['Date']).date()
-            
-            if email_date.weekday() >= 5:  # Skip weekends
-                continue
-
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain":
-                        body = part.get_payload(decode=True).decode()
-                    elif part.get_content_type() == "text/html":
-                        html_body = part.get_payload(decode=True).decode()
-                        soup = BeautifulSoup(html_body, "html.parser")
-                        body = soup.get_text()
-            else:
-                if msg.get_content_type() == "text/html":
-                    html_body = msg.get_payload(decode=True).decode()
-                    soup = BeautifulSoup(html_body, "html.parser")
-                    body = soup.get_text()
-                else:
-                    body = msg.get_payload(decode=True).decode()
-
-            # Extract symbols using regex
-            symbols = re.findall(r'New symbols:\s*([A-Z,\s]+)\s*were added to\s*(' + re.escape(keyword) + ')', body)
-            if symbols:
-                for symbol_group in symbols:
-                    extracted_symbols = symbol_group[0].replace(" ", "").split(",")
-                    signal_type = symbol_group[1]
-                    for symbol in extracted_symbols:
-                        stock_data.append([symbol, email_date, signal_type])
-
-            processed_email_ids.add(num)  # Mark email as processed
-
-        mail.close()
+        uidvalidity, uidnext = get_mailbox_state(mail, MAILBOX)
+        mail.select(MAILBOX, readonly=True)
+        if uidvalidity != stored_uidvalidity or synced_since is None:
+            # First run, or the mailbox was rebuilt and stored UIDs no longer apply
+            last_uid, synced_since = 0, start_date
+            uids = search_alert_uids(mail, SENDER_EMAIL, start_date)
+        else:
+            uids = search_alert_uids(mail, SENDER_EMAIL, min_uid=last_uid + 1)
+        rows = fetch_alerts(mail, uids, KEYWORDS, start_date)
+    finally:
         mail.logout()
-
-        df = pd.DataFrame(stock_data, columns=['Ticker', 'Date', 'Signal'])
-        df = df.sort_values(by=['Date', 'Ticker']).drop_duplicates(subset=['Ticker'], keep='last')
-
-        return df
-
-    except Exception as e:
-        st.error(f"Error: {e}")
-        return pd.DataFrame(columns=['Ticker', 'Date', 'Signal'])
+    save_email_alerts(SYNC_ACCOUNT, MAILBOX, uidvalidity, max([uidnext - 1, last_uid] + uids), synced_since, rows)
+
+def persist_live_alerts(uidvalidity, last_uid, rows):
+    """Write alerts pushed by the IDLE listener to the local store the dashboards read."""
+    _, _, synced_since = get_sync_state(SYNC_ACCOUNT, MAILBOX)
+    save_email_alerts(SYNC_ACCOUNT, MAILBOX, uidvalidity, last_uid, synced_since, rows)
+
+@st.cache_resource
+def get_alert_listener():
+    """Catch the store up once per process, then keep it current over one IMAP IDLE session.
+
+    Every open dashboard reads the store, so IMAP load no longer grows with the number of sessions.
+    """
+    sync_alert_emails(datetime.date.today() - datetime.timedelta(days=LOOKBACK_DAYS))
+    uidvalidity, last_uid, _ = get_sync_state(SYNC_ACCOUNT, MAILBOX)
+    listener = IdleListener(
+        EMAIL_ADDRESS, EMAIL_PASSWORD, SENDER_EMAIL, KEYWORDS,
+        mailbox=MAILBOX,
+        start_state=(uidvalidity, last_uid),
+        on_alerts=persist_live_alerts,
+    )
+    listener.start()
+    return listener
+
+def load_keyword_alerts():
+    """Return {keyword: Ticker/Date/Signal frame} of stored stock alerts, the latest alert per ticker."""
+    start_date = datetime.date.today() - datetime.timedelta(days=LOOKBACK_DAYS)
+    rows = [(symbol, email_datetime.astimezone(MARKET_TZ).date(), scan)
+            for symbol, scan, email_datetime in load_email_alerts(SYNC_ACCOUNT, MAILBOX, since_date=start_date)
+            if symbol.isalpha() and symbol.isupper()]
+    df = pd.DataFrame(rows, columns=['Ticker', 'Date', 'Signal'])
+    return {
+        keyword: group.sort_values(by=['Date', 'Ticker']).drop_duplicates(subset=['Ticker'], keep='last')
+        for keyword, group in df.groupby('Signal')
+    }
 
 def fetch_stock_prices(df):
-    prices = []
+    """Add alert-date and latest closes using one multi-ticker daily download for all alerts."""
+    columns = ['Symbol', 'Alert Date', 'Alert Date Close', 'Today Close', 'Return Alert(%)', 'Signal']
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
     today = datetime.date.today()
     
     if today.weekday() >= 5:  # Saturday (5) or Sunday (6)
         today = today - datetime.timedelta(days=today.weekday() - 4)  # Set to Friday
 
-    for index, row in df.iterrows():
-        ticker = row['Ticker']
-        alert_date = row['Date']
-        try:
-            stock = yf.Ticker(ticker)
-            hist_alert = stock.history(start=alert_date, end=alert_date + datetime.timedelta(days=1))
-            alert_price = round(hist_alert['Close'].iloc[0], 2) if not hist_alert.empty else None
-            hist_today = stock.history(period="1d")
-            today_price = round(hist_today['Close'].iloc[-1], 2) if not hist_today.empty else None
-            
-            if alert_price and today_price:
-                rate_of_return = ((today_price - alert_price) / alert_price) * 100
-            else:
-                rate_of_return = None
+    alerts = df[['Ticker', 'Date', 'Signal']].copy()
+    alerts['Alert Day'] = pd.to_datetime(alerts['Date']).astype('datetime64[ns]')
+    tickers = sorted(alerts['Ticker'].unique())
 
-            prices.append([ticker, alert_date, alert_price, today_price, rate_of_return, row['Signal']])
-        except Exception as e:
-            st.error(f"Error fetching data for {ticker}: {e}")
-            prices.append([ticker, alert_date, None, None, None, row['Signal']])
-    
-    price_df = pd.DataFrame(prices, columns=['Symbol', 'Alert Date', 'Alert Date Close', 'Today Close', 'Return Alert(%)', 'Signal'])
+    try:
+        panel = yf.download(
+            tickers,
+            start=alerts['Alert Day'].min().date(),
+            end=today + datetime.timedelta(days=1),
+            interval='1d',
+            auto_adjust=False,
+            progress=False,
+        )
+        closes = panel['Close']
+        if isinstance(closes, pd.Series):
+            closes = closes.to_frame(tickers[0])
+        closes.index = pd.to_datetime(closes.index).tz_localize(None).normalize().astype('datetime64[ns]')
+        closes = closes.sort_index()
+
+        # As-of join: close on the alert date, or the last session before it
+        daily = closes.stack().dropna().rename('Alert Date Close').reset_index()
+        daily.columns = ['Alert Day', 'Ticker', 'Alert Date Close']
+        alerts = pd.merge_asof(
+            alerts.sort_values('Alert Day'), daily.sort_values('Alert Day'),
+            on='Alert Day', by='Ticker', direction='backward'
+        )
+        alerts['Today Close'] = alerts['Ticker'].map(closes.ffill().iloc[-1])
+    except Exception as e:
+        st.error(f"Error fetching price data: {e}")
+        alerts['Alert Date Close'] = None
+        alerts['Today Close'] = None
+
+    alerts['Alert Date Close'] = pd.to_numeric(alerts['Alert Date Close']).round(2)
+    alerts['Today Close'] = pd.to_numeric(alerts['Today Close']).round(2)
+    alerts['Return Alert(%)'] = (alerts['Today Close'] - alerts['Alert Date Close']) / alerts['Alert Date Close'] * 100
+
+    price_df = alerts.rename(columns={'Ticker': 'Symbol', 'Date': 'Alert Date'})[columns]
+    price_df = price_df.astype(object).where(price_df.notna(), None)
     price_df = price_df.sort_values(by='Alert Date', ascending=False)
     
     return price_df
@@ -142,6 +154,7 @@ def main():
     st.write("This app polls your Thinkorswim alerts and analyzes stock data for different keywords.")
 
     button(username="tosalerts33", floating=False, width=221)
+    st_autorefresh(interval=POLL_INTERVAL * 1000, key="alerts_autorefresh")
 
     spy_price, qqq_price = get_spy_qqq_prices()
 
@@ -151,29 +164,58 @@ def main():
     with col2:
         st.metric("QQQ Latest Close Price", f"${qqq_price}")
 
-    with st.spinner("Polling alerts and analyzing data..."):
+    with st.spinner("Loading alerts and analyzing data..."):
+        try:
+            get_alert_listener()
+        except Exception as e:
+            st.error(f"Error: {e}")
+        keyword_alerts = load_keyword_alerts()
+
+        price_frames = {}
         for keyword in KEYWORDS:
-            symbols_df = extract_stock_symbols_from_email(EMAIL_ADDRESS, EMAIL_PASSWORD, SENDER_EMAIL, keyword)
-            if not symbols_df.empty:
-                price_df = fetch_stock_prices(symbols_df)
-                
-                store_data(price_df, table_name=f"{keyword}_alerts")
-                
-                stored_df = fetch_data(table_name=f"{keyword}_alerts")
+            symbols_df = keyword_alerts.get(keyword)
+            if symbols_df is not None and not symbols_df.empty:
+                price_frames[keyword] = fetch_stock_prices(symbols_df)
+
+        # The writer thread commits in the background; wait briefly so this render usually
+        # shows the new rows, but never let a slow or locked database stall the page
+        writer = get_writer()
+        for price_df in price_frames.values():
+            writer.submit(price_df)
+        writer.flush(timeout=WRITE_WAIT, sync=False)
+        write_stats = writer.stats()
+        st.caption(f"Write queue: {write_stats['queue_depth']} pending batches, "
+                   f"last flush {(write_stats['last_flush_seconds'] or 0) * 1000:.0f} ms")
+        if write_stats['last_error']:
+            st.warning(f"Saving alerts failed, will retry: {write_stats['last_error']}")
+
+        for keyword in KEYWORDS:
+            if keyword in price_frames:
+                pages = max(1, -(-count_data(scans=[keyword]) // PAGE_SIZE))
                 
                 st.markdown(f"### {TOOLTIPS[keyword]['header']}")
+                page = st.number_input("Page", min_value=1, max_value=pages, value=1, key=f"{keyword}_page")
+                stored_df = fetch_data(scans=[keyword], limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE)
                 st.dataframe(stored_df)
 
-                csv = stored_df.to_csv(index=False).encode('utf-8')
-                st.download_button(
-                    label=f"Download {TOOLTIPS[keyword]['header']} Data as CSV",
-                    data=csv,
-                    file_name=f"{keyword}_alerts.csv",
-                    mime="text/csv",
-                )
+                # Streaming the full history is only worth it on request, not on every rerun
+                if st.button(f"Prepare {TOOLTIPS[keyword]['header']} CSV", key=f"{keyword}_csv"):
+                    csv = ''.join(chunk.to_csv(index=False, header=i == 0)
+                                  for i, chunk in enumerate(iter_data(scans=[keyword]))).encode('utf-8')
+                    st.download_button(
+                        label=f"Download {TOOLTIPS[keyword]['header']} Data as CSV",
+                        data=csv,
+                        file_name=f"{keyword}_alerts.csv",
+                        mime="text/csv",
+                    )
             else:
                 st.warning(f"No new stock found for {keyword}.")
 
+        high_conviction_df = fetch_high_conviction()
+        if not high_conviction_df.empty:
+            st.markdown("### High Conviction (flagged by multiple scans on the same day)")
+            st.dataframe(high_conviction_df)
+
     st.markdown("---")
     st.markdown("### **Disclaimer and Important Messages**")
     st.markdown("""
@@ -193,8 +235,5 @@ def main():
     By using this tool, you acknowledge and agree that you are using it at your own risk. The creator disclaims all liability for any damages or losses arising from your use of this tool.
     """)
 
-    time.sleep(POLL_INTERVAL)
-    st.rerun()
-
 if __name__ == "__main__":
     main()
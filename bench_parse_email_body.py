@@ -0,0 +1,98 @@
+"""Benchmark alert body parsing: BeautifulSoup DOM vs the DOM-free fast path in tos_alerts.
+
+Usage:
+    python bench_parse_email_body.py [DIR_OF_EML_FILES] [--repeat N]
+
+Without a directory, a synthetic corpus shaped like Thinkorswim alert emails is generated.
+"""
+import argparse
+import email
+import glob
+import os
+import re
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from bs4 import BeautifulSoup
+
+from tos_alerts import parse_email_body
+
+SYMBOL_PATTERN = re.compile(r'New symbols:\s*([A-Z,\s]+)\s*were added to\s*(\S+)')
+
+ALERT_HTML = """<html><head><style>td {{ font-family: Arial; }}</style></head>
+<body><table width="100%" cellpadding="0" cellspacing="0"><tr><td>
+<img src="https://tosweb.example/logo.png" alt="thinkorswim"/></td></tr>
+<tr><td><p>Alert:&nbsp;New symbols: {symbols} were added to {scan}.</p>
+<p>Scan run at {time} &amp; delivered by thinkorswim&reg;.</p></td></tr>
+<tr><td><small>Market data &copy; 2024. This is an automated message.</small></td></tr>
+</table></body></html>"""
+
+
+def dom_parse_email_body(msg):
+    """The BeautifulSoup-only implementation the fast path replaces."""
+    for part in msg.walk():
+        if part.get_content_type() in ["text/plain", "text/html"]:
+            body = part.get_payload(decode=True).decode()
+            if part.get_content_type() == "text/html":
+                soup = BeautifulSoup(body, "html.parser")
+                return soup.get_text(separator=' ', strip=True)
+            return body
+    return ""
+
+
+def synthetic_corpus(size=500):
+    scans = ["Long_VP", "orb_bull", "A+Bull_30m", "tmo_long", "bull_Daily_sqz", "LSMHG_Long"]
+    tickers = ["AAPL", "MSFT", "NVDA", "TSLA", "AMD", "META", "AMZN", "GOOGL", "NFLX", "PLTR"]
+    messages = []
+    for i in range(size):
+        scan = scans[i % len(scans)]
+        symbols = ", ".join(tickers[j % len(tickers)] for j in range(i % 4 + 1))
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = f"Alert: New symbols added to {scan}"
+        msg.attach(MIMEText(ALERT_HTML.format(symbols=symbols, scan=scan, time=f"10:{i % 60:02d}"), 'html'))
+        messages.append(email.message_from_bytes(msg.as_bytes()))
+    return messages
+
+
+def load_corpus(directory):
+    messages = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.eml'))):
+        with open(path, 'rb') as f:
+            messages.append(email.message_from_bytes(f.read()))
+    return messages
+
+
+def messages_per_second(parse, messages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for msg in messages:
+            parse(msg)
+    return len(messages) * repeat / (time.perf_counter() - start)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('corpus', nargs='?', help="directory of saved .eml alert emails")
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    messages = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    if not messages:
+        raise SystemExit(f"No .eml files found in {args.corpus}")
+
+    mismatches = sum(
+        SYMBOL_PATTERN.findall(dom_parse_email_body(msg)) != SYMBOL_PATTERN.findall(parse_email_body(msg))
+        for msg in messages
+    )
+
+    before = messages_per_second(dom_parse_email_body, messages, args.repeat)
+    after = messages_per_second(parse_email_body, messages, args.repeat)
+    print(f"corpus: {len(messages)} messages ({args.corpus or 'synthetic'})")
+    print(f"BeautifulSoup: {before:,.0f} msg/s")
+    print(f"fast path:     {after:,.0f} msg/s ({after / before:.1f}x)")
+    print(f"symbol mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
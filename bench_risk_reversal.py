@@ -0,0 +1,108 @@
+"""Benchmark risk reversal detection: Cartesian call/put merge vs the sort-based proximity join in flowSummary.
+
+Usage:
+    python bench_risk_reversal.py [CBOE_CSV ...] [--repeat N] [--proximity P]
+
+Pass the saved symbol_data CSVs of one trading day (cone, opt, ctwo, exo). Without files, a synthetic
+day shaped like the combined CBOE feeds is generated, including deep SPX/SPY-style chains.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from cboe_feed import read_options_csv
+from flowSummary import filter_risk_reversal
+
+KEY = ['Symbol', 'Type', 'Expiration', 'Strike Price']
+
+
+def merge_filter_risk_reversal(df, exclude_symbols, strike_proximity=5):
+    """The per-(Symbol, Expiration) Cartesian merge plus iterrows reshape the join replaces."""
+    if exclude_symbols:
+        df = df[~df['Symbol'].isin(exclude_symbols)]
+    calls = df[df['Call/Put'] == 'C']
+    puts = df[df['Call/Put'] == 'P']
+    merged = pd.merge(calls, puts, on=['Symbol', 'Expiration'], suffixes=('_call', '_put'))
+    merged = merged[
+        (abs(merged['Strike Price_call'] - merged['Strike Price_put']) <= strike_proximity) &
+        (merged['Volume_call'] >= 3000) &
+        (merged['Volume_put'] >= 3000)
+    ]
+    merged = merged.drop_duplicates(subset=['Symbol', 'Expiration', 'Strike Price_call', 'Strike Price_put'])
+    reshaped = []
+    for _, row in merged.iterrows():
+        for leg, suffix in (('Call', '_call'), ('Put', '_put')):
+            reshaped.append({
+                'Symbol': row['Symbol'], 'Type': leg, 'Expiration': row['Expiration'],
+                'Strike Price': row['Strike Price' + suffix], 'Volume': row['Volume' + suffix],
+                'Last Price': row['Last Price' + suffix],
+            })
+    reshaped = pd.DataFrame(reshaped, columns=['Symbol', 'Type', 'Expiration', 'Strike Price', 'Volume', 'Last Price'])
+    return reshaped.drop_duplicates(subset=KEY)
+
+
+def synthetic_day(seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    # (symbol, spot, strike step, strikes per expiry, expiries)
+    chains = [('SPX', 5800, 5, 400, 30), ('SPY', 580, 1, 300, 30), ('QQQ', 500, 1, 250, 25)]
+    chains += [(f'S{i:04d}', rng.uniform(10, 500), 2.5, 40, 8) for i in range(3000)]
+    expiries = pd.bdate_range(pd.Timestamp.today().normalize(), periods=30)
+    for symbol, spot, step, width, n_expiries in chains:
+        strikes = np.round(spot / step) * step + step * np.arange(-width // 2, width // 2)
+        grid = pd.MultiIndex.from_product([expiries[:n_expiries], strikes, ['C', 'P']],
+                                          names=['Expiration', 'Strike Price', 'Call/Put']).to_frame(index=False)
+        grid['Symbol'] = symbol
+        frames.append(grid)
+    df = pd.concat(frames, ignore_index=True)
+    # Heavy-tailed volume, so deep chains have many legs above the 3,000 contract threshold
+    df['Volume'] = rng.pareto(1.2, len(df)).astype(np.int64) * 150 + 100
+    df['Last Price'] = rng.uniform(0.05, 40, len(df)).round(2)
+    # The same contract trades on several exchanges, so rows repeat across feeds
+    df = pd.concat([df, df.sample(frac=0.3, random_state=seed)], ignore_index=True)
+    return df.astype({'Symbol': 'category', 'Call/Put': 'category',
+                      'Strike Price': np.float32, 'Last Price': np.float32})
+
+
+def seconds(function, data, repeat, proximity):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function(data, [], strike_proximity=proximity)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('files', nargs='*', help="saved CBOE symbol_data CSV files for one day")
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--proximity', type=float, default=5)
+    args = arg_parser.parse_args()
+
+    if args.files:
+        frames = []
+        for path in args.files:
+            with open(path, 'rb') as f:
+                frames.append(read_options_csv(f))
+        data = pd.concat(frames, ignore_index=True).astype({'Symbol': 'category'})
+    else:
+        data = synthetic_day()
+
+    before, expected = seconds(merge_filter_risk_reversal, data, args.repeat, args.proximity)
+    after, result = seconds(filter_risk_reversal, data, args.repeat, args.proximity)
+
+    # iterrows upcasts float32 columns, so compare on common dtypes
+    dtypes = {'Symbol': str, 'Strike Price': np.float64, 'Volume': np.int64}
+    expected = expected.astype(dtypes).sort_values(KEY, ignore_index=True)
+    result = result.astype(dtypes).sort_values(KEY, ignore_index=True)
+    same = expected[KEY + ['Volume']].equals(result[KEY + ['Volume']])
+
+    print(f"rows: {len(data):,} ({', '.join(args.files) or 'synthetic'})")
+    print(f"merge + iterrows: {before * 1000:,.1f} ms")
+    print(f"proximity join:   {after * 1000:,.1f} ms ({before / after:.1f}x)")
+    print(f"legs: {len(result):,}, identical to merge: {same}")
+
+
+if __name__ == "__main__":
+    main()
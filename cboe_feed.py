@@ -0,0 +1,305 @@
+import datetime
+import logging
+import threading
+import time
+from collections import deque
+from io import BytesIO
+from typing import IO, Callable, Deque, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+logger = logging.getLogger(__name__)
+
+MIN_VOLUME = 100  # contracts; thinner prints are dropped while parsing
+CHUNK_ROWS = 100_000  # rows parsed per chunk, bounding peak memory on the full multi-market file
+DELTA_RETENTION = datetime.timedelta(hours=2)  # longest rolling window a snapshot store can answer
+REFRESH_INTERVAL = 60  # seconds between background downloads of the CBOE feeds
+QUOTE_TTL = 300  # seconds an underlying quote is reused for IV and delta
+
+# CBOE option roots whose underlying trades under another Yahoo symbol.
+# VIX options settle on VIX futures; pricing them off spot VIX is only an approximation.
+UNDERLYING_SYMBOLS = {
+    'SPX': '^SPX', 'SPXW': '^SPX', 'XSP': '^XSP', 'NDX': '^NDX', 'NDXP': '^NDX',
+    'RUT': '^RUT', 'RUTW': '^RUT', 'VIX': '^VIX', 'VIXW': '^VIX', 'DJX': '^DJI',
+}
+# Roots listed on a fraction of their Yahoo symbol's level
+UNDERLYING_SCALE = {'DJX': 0.01}  # DJX options are on 1/100 of the DJIA
+
+CONTRACT_KEY = ['Symbol', 'Expiration', 'Strike Price', 'Call/Put']
+
+# The only columns any view reads, with the narrowest dtypes that hold them
+CALL_PUT_DTYPE = pd.CategoricalDtype(['C', 'P'])
+SCHEMA = {
+    'Symbol': str,
+    'Call/Put': CALL_PUT_DTYPE,
+    'Expiration': str,
+    'Strike Price': np.float32,
+    'Volume': 'Int64',  # nullable, so a blank volume cell doesn't abort the whole feed
+    'Last Price': np.float32,
+}
+
+def read_options_csv(source: Union[bytes, IO[bytes]], min_volume: int = MIN_VOLUME,
+                     min_expiration: Optional[datetime.date] = None,
+                     exclude_expiration: Optional[datetime.date] = None) -> pd.DataFrame:
+    """Parse a CBOE symbol_data CSV from raw bytes with a fixed schema, filtering each chunk as it is read.
+
+    Rows below min_volume, expiring before min_expiration or on exclude_expiration never
+    reach the combined frame. Symbol is returned as a categorical, and a blank Volume reads as 0.
+    """
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    chunks = []
+    reader = pd.read_csv(source, usecols=lambda column: column in SCHEMA, dtype=SCHEMA, chunksize=CHUNK_ROWS)
+    for chunk in reader:
+        # A missing volume means no trades; filling it leaves a plain int64 column for the cut
+        volume = chunk['Volume'].fillna(0).astype(np.int64)
+        chunk = chunk.assign(Volume=volume)[volume >= min_volume]
+        # Dates are parsed only for rows that survived the volume cut
+        expiration = pd.to_datetime(chunk['Expiration'])
+        keep = pd.Series(True, index=chunk.index)
+        if min_expiration is not None:
+            keep &= expiration >= pd.Timestamp(min_expiration)
+        if exclude_expiration is not None:
+            keep &= expiration.dt.normalize() != pd.Timestamp(exclude_expiration)
+        chunks.append(chunk[keep].assign(Expiration=expiration[keep]))
+
+    if not chunks:
+        return _empty_frame()
+    # Per-chunk categories would differ, so Symbol is categorised once on the filtered rows
+    return pd.concat(chunks, ignore_index=True).astype({'Symbol': 'category'})
+
+def _empty_frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        'Symbol': pd.Series(dtype='category'),
+        'Call/Put': pd.Series(dtype=CALL_PUT_DTYPE),
+        'Expiration': pd.Series(dtype='datetime64[ns]'),
+        'Strike Price': pd.Series(dtype=np.float32),
+        'Volume': pd.Series(dtype=np.int64),
+        'Last Price': pd.Series(dtype=np.float32),
+    })
+
+def contract_totals(df: pd.DataFrame) -> pd.DataFrame:
+    """Cumulative Volume and Notional per contract, summed across the exchanges that list it."""
+    notional = df['Volume'].to_numpy(np.float64) * np.round(df['Last Price'].to_numpy(np.float64), 4) * 100
+    totals = (
+        df[CONTRACT_KEY + ['Volume']].assign(Notional=notional)
+        .groupby(CONTRACT_KEY, observed=True, sort=True).sum()
+    )
+    # Categories differ between snapshots, so key on plain values to align them
+    symbols, expirations, strikes, call_put = totals.index.levels
+    totals.index = totals.index.set_levels(
+        [symbols.astype(str), expirations, strikes.astype(np.float64), call_put.astype(str)], verify_integrity=False
+    )
+    return totals
+
+class FlowCube:
+    """Per-contract flow aggregates for one snapshot, sorted by (Symbol, Strike Price, Call/Put, Expiration).
+
+    Built once per snapshot; symbol, strike and call/put selections are then prefix slices
+    of the sorted index instead of scans of the full frame.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        totals = contract_totals(df).rename(columns={'Notional': 'Transaction Value'})
+        totals['Avg Price'] = (totals['Transaction Value'] / (totals['Volume'] * 100)).round(2)
+        self.totals = totals.reorder_levels(['Symbol', 'Strike Price', 'Call/Put', 'Expiration']).sort_index()
+        self.symbols = self.totals.index.unique(level='Symbol').tolist()
+
+    def strikes(self, symbol: str) -> List[float]:
+        return self._slice((symbol,)).index.get_level_values('Strike Price').unique().tolist()
+
+    def summary(self, symbol: str, strike: Optional[float] = None, call_put: Optional[str] = None) -> pd.DataFrame:
+        """Aggregates for the selection, largest transaction value first."""
+        if strike is not None:
+            key = (symbol, strike, call_put) if call_put else (symbol, strike)
+            selected = self._slice(key)
+        else:
+            selected = self._slice((symbol,))
+            if call_put:
+                selected = selected[selected.index.get_level_values('Call/Put') == call_put]
+        return (
+            selected.reset_index()[CONTRACT_KEY + ['Avg Price', 'Volume', 'Transaction Value']]
+            .sort_values('Transaction Value', ascending=False, ignore_index=True)
+        )
+
+    def _slice(self, key: tuple) -> pd.DataFrame:
+        # Binary search for the key's bounds on the lexsorted index
+        start, stop = self.totals.index.slice_locs(key, key)
+        return self.totals.iloc[start:stop]
+
+class FlowSnapshots:
+    """Turns successive cumulative CBOE snapshots into per-contract volume and notional deltas.
+
+    Only the latest totals are kept in full; each refresh stores just the contracts that
+    traded since the previous one, and deltas older than retention are dropped. Snapshots
+    must be complete (every feed present) or missing volume reappears as new flow.
+    Snapshots are cut at MIN_VOLUME, so a contract crossing that threshold reports its whole
+    volume so far as new flow, overstating it by at most MIN_VOLUME - 1 contracts.
+    """
+
+    def __init__(self, retention: datetime.timedelta = DELTA_RETENTION):
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._totals: Optional[pd.DataFrame] = None
+        self._session: Optional[datetime.date] = None
+        self._deltas: Deque[Tuple[datetime.datetime, pd.DataFrame]] = deque()
+
+    def update(self, df: pd.DataFrame, as_of: Optional[datetime.datetime] = None) -> bool:
+        """Record a new snapshot; return False if nothing traded since the previous one."""
+        as_of = as_of or datetime.datetime.now()
+        totals = contract_totals(df)
+        with self._lock:
+            previous = self._totals
+            self._totals = totals
+            if self._session != as_of.date():
+                # A new trading day starts a new baseline rather than reporting the day so far
+                self._session = as_of.date()
+                self._deltas.clear()
+                return False
+            if previous is None:
+                return False
+            delta = totals.sub(previous.reindex(totals.index, fill_value=0))
+            # Totals only fall on corrections or the feed's daily reset; neither is new flow
+            delta = delta[delta['Volume'] > 0]
+            if delta.empty:
+                return False
+            self._deltas.append((as_of, delta))
+            while self._deltas and self._deltas[0][0] < as_of - self.retention:
+                self._deltas.popleft()
+            return True
+
+    def since_last(self) -> pd.DataFrame:
+        """Contracts that traded between the two most recent distinct snapshots, by notional."""
+        with self._lock:
+            delta = self._deltas[-1][1] if self._deltas else None
+        return self._view(delta)
+
+    def rolling(self, minutes: float, now: Optional[datetime.datetime] = None) -> pd.DataFrame:
+        """Contracts that traded in the last minutes, summed over every snapshot in the window."""
+        cutoff = (now or datetime.datetime.now()) - datetime.timedelta(minutes=minutes)
+        with self._lock:
+            deltas = [delta for as_of, delta in self._deltas if as_of >= cutoff]
+        if not deltas:
+            return self._view(None)
+        return self._view(pd.concat(deltas).groupby(level=CONTRACT_KEY).sum())
+
+    def last_update(self) -> Optional[datetime.datetime]:
+        with self._lock:
+            return self._deltas[-1][0] if self._deltas else None
+
+    @staticmethod
+    def _view(delta: Optional[pd.DataFrame]) -> pd.DataFrame:
+        if delta is None:
+            return pd.DataFrame(columns=CONTRACT_KEY + ['Volume', 'Notional'])
+        return delta.reset_index().sort_values('Notional', ascending=False, ignore_index=True)
+
+class FeedRefresher(threading.Thread):
+    """Background thread that owns the CBOE dataset and re-fetches it every interval seconds.
+
+    Readers get the last good snapshot immediately from latest(); a failed or empty fetch
+    keeps serving the previous one. Each new snapshot is passed to every on_snapshot callback.
+    """
+
+    def __init__(self, fetch: Callable[[], pd.DataFrame], interval: float = REFRESH_INTERVAL,
+                 on_snapshot: Optional[List[Callable[[pd.DataFrame], object]]] = None):
+        super().__init__(name='cboe-refresher', daemon=True)
+        self.fetch = fetch
+        self.interval = interval
+        self.on_snapshot = list(on_snapshot or [])
+        self.last_error: Optional[str] = None
+        self.last_fetch_seconds: Optional[float] = None
+        self._data: Optional[pd.DataFrame] = None
+        self._fetched_at: Optional[datetime.datetime] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def latest(self) -> Tuple[Optional[pd.DataFrame], Optional[datetime.datetime]]:
+        """Return (data, fetched_at) for the last good snapshot, or (None, None) before the first."""
+        with self._lock:
+            return self._data, self._fetched_at
+
+    def age(self) -> Optional[datetime.timedelta]:
+        with self._lock:
+            return None if self._fetched_at is None else datetime.datetime.now() - self._fetched_at
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the first snapshot is available; only a cold process ever needs to."""
+        return self._ready.wait(timeout)
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            self._refresh()
+            self._stop_event.wait(self.interval)
+
+    def _refresh(self) -> None:
+        started = time.perf_counter()
+        try:
+            data = self.fetch()
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning(f"CBOE refresh failed, serving the previous snapshot: {e}")
+            return
+        self.last_fetch_seconds = time.perf_counter() - started
+        if data is None or data.empty:
+            self.last_error = "no feed returned data"
+            return
+
+        fetched_at = datetime.datetime.now()
+        with self._lock:
+            self._data, self._fetched_at = data, fetched_at
+        self.last_error = None
+        self._ready.set()
+        for callback in self.on_snapshot:
+            try:
+                callback(data)
+            except Exception as e:
+                logger.error(f"Snapshot callback failed: {e}")
+
+class QuoteCache:
+    """Process-local underlying prices for the option symbols, fetched in one batch and reused for ttl seconds.
+
+    refresh() does the blocking download and is meant for a background thread such as a
+    FeedRefresher callback; get() only reads what is cached, so page renders never wait on Yahoo.
+    """
+
+    def __init__(self, ttl: float = QUOTE_TTL):
+        self.ttl = ttl
+        self._quotes: dict = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, symbols) -> None:
+        """Download quotes for the symbols that are missing or older than ttl."""
+        now = time.monotonic()
+        with self._lock:
+            stale = sorted(symbol for symbol in set(map(str, symbols))
+                           if symbol not in self._quotes or now - self._quotes[symbol][1] > self.ttl)
+        if stale:
+            fetched = self._download(stale)
+            with self._lock:
+                for symbol, price in fetched.items():
+                    self._quotes[symbol] = (price, now)
+
+    def get(self, symbols) -> dict:
+        """Return {symbol: price} for the cached symbols, without downloading anything."""
+        with self._lock:
+            return {symbol: self._quotes[symbol][0] for symbol in set(map(str, symbols)) if symbol in self._quotes}
+
+    @staticmethod
+    def _download(symbols: List[str]) -> dict:
+        tickers = sorted({UNDERLYING_SYMBOLS.get(symbol, symbol) for symbol in symbols})
+        try:
+            panel = yf.download(tickers, period='5d', interval='1d', auto_adjust=False, progress=False)
+            closes = panel['Close']
+            if isinstance(closes, pd.Series):
+                closes = closes.to_frame(tickers[0])
+            latest = closes.ffill().iloc[-1].dropna()
+        except Exception as e:
+            logger.error(f"Error fetching underlying quotes: {e}")
+            return {}
+        return {symbol: float(latest[ticker]) * UNDERLYING_SCALE.get(symbol, 1.0) for symbol in symbols
+                if (ticker := UNDERLYING_SYMBOLS.get(symbol, symbol)) in latest.index}
@@ -1,37 +1,78 @@
 import pandas as pd
 import requests
-from io import StringIO
+from requests.adapters import HTTPAdapter
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import streamlit as st
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
-import time  # New import for auto-refresh
+from cboe_feed import FeedRefresher, FlowCube, FlowSnapshots, QuoteCache, read_options_csv
+from option_greeks import add_greeks
+from streamlit_autorefresh import st_autorefresh
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+REQUEST_TIMEOUT = 30  # seconds per CBOE feed download
+FIRST_SNAPSHOT_WAIT = 60  # seconds a cold process waits for its first download
+
+CBOE_URLS = [
+    "https://www.cboe.com/us/options/market_statistics/symbol_data/csv/?mkt=cone",
+    "https://www.cboe.com/us/options/market_statistics/symbol_data/csv/?mkt=opt",
+    "https://www.cboe.com/us/options/market_statistics/symbol_data/csv/?mkt=ctwo",
+    "https://www.cboe.com/us/options/market_statistics/symbol_data/csv/?mkt=exo"
+]
+
+# Keep-alive connections shared by every refresh, and the validators plus parsed frame of each feed
+_session: Optional[requests.Session] = None
+_feed_cache: Dict[str, Tuple[Optional[str], Optional[str], pd.DataFrame]] = {}
+_feed_lock = threading.Lock()
+
 def validate_csv_content_type(response: requests.Response) -> bool:
     """Validate if the response content type is CSV."""
     return 'text/csv' in response.headers.get('Content-Type', '')
 
 def apply_filters(df: pd.DataFrame) -> pd.DataFrame:
-    """Apply filters to the DataFrame."""
-    df = df[df['Volume'] >= 100]
-    df['Expiration'] = pd.to_datetime(df['Expiration'])
-    df = df[df['Expiration'].dt.date >= datetime.now().date()]
-    return df
+    """Drop contracts that expired before today from an already parsed feed."""
+    return df[df['Expiration'] >= pd.Timestamp(datetime.now().date())]
+
+def get_session() -> requests.Session:
+    """Return the shared keep-alive session, creating it on first use."""
+    global _session
+    with _feed_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
 
 def fetch_data_from_url(url: str) -> Optional[pd.DataFrame]:
-    """Fetch and process data from a single URL."""
+    """Fetch and process data from a single URL, reusing the last frame if the feed is unchanged."""
+    with _feed_lock:
+        cached = _feed_cache.get(url)
+    headers = {}
+    if cached is not None:
+        etag, last_modified, _ = cached
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
     try:
-        response = requests.get(url)
+        response = get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304 and cached is not None:
+            # Unchanged feed; only the expiration cut-off can have moved since it was parsed
+            return apply_filters(cached[2])
         response.raise_for_status()
 
         if validate_csv_content_type(response):
-            csv_data = StringIO(response.text)
-            df = pd.read_csv(csv_data)
-            return apply_filters(df)
+            df = read_options_csv(response.content, min_expiration=datetime.now().date())
+            with _feed_lock:
+                _feed_cache[url] = (response.headers.get('ETag'), response.headers.get('Last-Modified'), df)
+            return df
         else:
             logger.warning(f"Data from {url} is not in CSV format. Skipping...")
     except Exception as e:
@@ -39,89 +80,124 @@ def fetch_data_from_url(url: str) -> Optional[pd.DataFrame]:
     return None
 
 def fetch_data_from_urls(urls: List[str]) -> pd.DataFrame:
-    """Fetch and combine data from multiple CSV URLs into a single DataFrame."""
-    data_frames = []
-    for url in urls:
-        df = fetch_data_from_url(url)
-        if df is not None:
-            data_frames.append(df)
-    return pd.concat(data_frames, ignore_index=True) if data_frames else pd.DataFrame()
-
-@st.cache_data(ttl=1800)  # Cache is valid for 1800 seconds (30 minutes)
-def load_data(urls: List[str]) -> pd.DataFrame:
-    """Load and cache data from URLs."""
-    return fetch_data_from_urls(urls)
+    """Fetch the CSV URLs concurrently and combine them into a single DataFrame."""
+    if not urls:
+        return pd.DataFrame()
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        results = list(executor.map(fetch_data_from_url, urls))
+    data_frames = [df for df in results if df is not None]
+    if not data_frames:
+        return pd.DataFrame()
+    # Each feed has its own Symbol categories; unify them after the concat
+    combined = pd.concat(data_frames, ignore_index=True).astype({'Symbol': 'category'})
+    # A partial result has lower totals than a full one, so callers that diff snapshots must know
+    combined.attrs['missing_feeds'] = [url for url, df in zip(urls, results) if df is None]
+    return combined
+
+@st.cache_resource
+def get_flow_snapshots() -> FlowSnapshots:
+    """Process-wide snapshot store, so every session sees the same deltas."""
+    return FlowSnapshots()
+
+@st.cache_resource(max_entries=2)
+def get_flow_cube(_data: pd.DataFrame, fetched_at: datetime) -> FlowCube:
+    """Build the drill-down cube once per snapshot; fetched_at identifies the snapshot."""
+    return FlowCube(_data)
+
+@st.cache_resource
+def get_quote_cache() -> QuoteCache:
+    return QuoteCache()
+
+def with_greeks(df: pd.DataFrame) -> pd.DataFrame:
+    """Add IV, Delta and Delta Notional using cached underlying prices.
+
+    Quotes are filled by record_quotes on the refresher thread; symbols not cached yet get NaN.
+    """
+    if df.empty:
+        return df
+    spots = get_quote_cache().get(df['Symbol'].unique())
+    return add_greeks(df, spots)
+
+def record_flow(snapshots: FlowSnapshots, data: pd.DataFrame) -> None:
+    """Diff only complete snapshots; a missing feed would look like volume disappearing and returning."""
+    missing = data.attrs.get('missing_feeds')
+    if missing:
+        logger.warning(f"Skipping flow deltas for a partial snapshot, missing {missing}")
+        return
+    snapshots.update(data)
+
+def record_quotes(quotes: QuoteCache, data: pd.DataFrame) -> None:
+    """Download underlying quotes for every symbol the greeks tabs can show, off the render path."""
+    risk_reversal = filter_risk_reversal(data, exclude_symbols=[])
+    whales = summarize_transactions(data, whale_filter=True)
+    quotes.refresh(set(risk_reversal['Symbol'].astype(str)) | set(whales['Symbol'].astype(str)))
+
+@st.cache_resource
+def get_refresher() -> FeedRefresher:
+    """Process-wide background download of the CBOE feeds; one fetch serves every session.
+
+    The shared stores are resolved here, on the script thread, and bound into the callbacks,
+    because the refresher thread has no ScriptRunContext for Streamlit's cache getters.
+    """
+    snapshots, quotes = get_flow_snapshots(), get_quote_cache()
+    refresher = FeedRefresher(lambda: fetch_data_from_urls(CBOE_URLS), on_snapshot=[
+        lambda data: record_flow(snapshots, data),
+        lambda data: record_quotes(quotes, data),
+    ])
+    refresher.start()
+    return refresher
+
+RISK_REVERSAL_MIN_VOLUME = 3000  # contracts on each leg
+
+def has_strike_within(legs: pd.DataFrame, others: pd.DataFrame, strike_proximity: float) -> pd.Series:
+    """For each leg, whether others has a strike within strike_proximity on the same Symbol and Expiration.
+
+    A nearest-strike as-of join inside each (Symbol, Expiration) bucket, so no pair is materialised.
+    """
+    # merge_asof rejects null keys; a leg without a strike can never pair, as in the old Cartesian filter
+    left = legs[['Symbol', 'Expiration', 'Strike Price']].dropna(subset=['Strike Price']).reset_index().sort_values('Strike Price')
+    right = others[['Symbol', 'Expiration', 'Strike Price']].dropna(subset=['Strike Price']).drop_duplicates().sort_values('Strike Price')
+    right['Paired Strike'] = right['Strike Price']
+    matched = pd.merge_asof(
+        left, right, on='Strike Price', by=['Symbol', 'Expiration'],
+        direction='nearest', tolerance=float(strike_proximity)
+    )
+    paired = pd.Series(matched['Paired Strike'].notna().to_numpy(), index=matched['index'])
+    return paired.reindex(legs.index, fill_value=False)
 
 def filter_risk_reversal(df: pd.DataFrame, exclude_symbols: List[str], strike_proximity: int = 5) -> pd.DataFrame:
-    """Filter for Risk Reversal trades."""
+    """Filter for Risk Reversal trades: call and put legs on the same expiry within strike_proximity."""
     if exclude_symbols:
         df = df[~df['Symbol'].isin(exclude_symbols)]
 
+    # Volume is a per-leg condition, so apply it before looking for partners
+    df = df[df['Volume'] >= RISK_REVERSAL_MIN_VOLUME]
     calls = df[df['Call/Put'] == 'C']
     puts = df[df['Call/Put'] == 'P']
 
-    merged = pd.merge(
-        calls, puts,
-        on=['Symbol', 'Expiration'],
-        suffixes=('_call', '_put')
-    )
-
-    merged = merged[
-        (abs(merged['Strike Price_call'] - merged['Strike Price_put']) <= strike_proximity) &
-        (merged['Volume_call'] >= 3000) &
-        (merged['Volume_put'] >= 3000)
-    ]
-
-    columns_to_keep = [
-        'Symbol', 'Expiration',
-        'Strike Price_call', 'Volume_call', 'Last Price_call',
-        'Strike Price_put', 'Volume_put', 'Last Price_put'
-    ]
-    merged = merged[columns_to_keep]
-
-    merged = merged.drop_duplicates(subset=[
-        'Symbol', 'Expiration', 'Strike Price_call', 'Strike Price_put'
+    legs = pd.concat([
+        calls[has_strike_within(calls, puts, strike_proximity)].assign(Type='Call'),
+        puts[has_strike_within(puts, calls, strike_proximity)].assign(Type='Put'),
     ])
-
-    reshaped_data = []
-    for _, row in merged.iterrows():
-        reshaped_data.append({
-            'Symbol': row['Symbol'],
-            'Type': 'Call',
-            'Expiration': row['Expiration'],
-            'Strike Price': row['Strike Price_call'],
-            'Volume': row['Volume_call'],
-            'Last Price': row['Last Price_call']
-        })
-        reshaped_data.append({
-            'Symbol': row['Symbol'],
-            'Type': 'Put',
-            'Expiration': row['Expiration'],
-            'Strike Price': row['Strike Price_put'],
-            'Volume': row['Volume_put'],
-            'Last Price': row['Last Price_put']
-        })
-
-    reshaped_df = pd.DataFrame(reshaped_data)
-
-    reshaped_df = reshaped_df.drop_duplicates(subset=[
-        'Symbol', 'Expiration', 'Strike Price', 'Type'
-    ])
-
-    return reshaped_df
+    # A contract listed by several exchanges keeps its first row, as before
+    legs = legs.drop_duplicates(subset=['Symbol', 'Expiration', 'Strike Price', 'Type'])
+    legs = legs.sort_values(['Symbol', 'Expiration', 'Strike Price', 'Type'], ignore_index=True)
+    return legs[['Symbol', 'Type', 'Expiration', 'Strike Price', 'Volume', 'Last Price']]
 
 def summarize_transactions(df: pd.DataFrame, whale_filter: bool = False, exclude_symbols: List[str] = None) -> pd.DataFrame:
     """Summarize transactions from the given DataFrame."""
     if exclude_symbols:
         df = df[~df['Symbol'].isin(exclude_symbols)]
 
-    df['Transaction Value'] = df['Volume'] * df['Last Price'] * 100
+    # The snapshot is shared by every session, so add the column to a new frame
+    # Widen the float32 price first so notional sums don't carry float32 rounding noise
+    df = df.assign(**{'Transaction Value': df['Volume'] * df['Last Price'].astype('float64').round(4) * 100})
 
     if whale_filter:
         df = df[df['Transaction Value'] > 5_000_000]
 
     summary = (
-        df.groupby(['Symbol', 'Expiration', 'Strike Price', 'Call/Put', 'Last Price'])
+        df.groupby(['Symbol', 'Expiration', 'Strike Price', 'Call/Put', 'Last Price'], observed=True)
         .agg({'Volume': 'sum', 'Transaction Value': 'sum'})
         .reset_index()
     )
@@ -149,23 +225,34 @@ def run():
             "Refresh Interval (seconds)", min_value=10, max_value=1800, value=30, step=10
         ) if auto_refresh else None
 
-    urls = [
-        "https://www.cboe.com/us/options/market_statistics/symbol_data/csv/?mkt=cone",
-        "https://www.cboe.com/us/options/market_statistics/symbol_data/csv/?mkt=opt",
-        "https://www.cboe.com/us/options/market_statistics/symbol_data/csv/?mkt=ctwo",
-        "https://www.cboe.com/us/options/market_statistics/symbol_data/csv/?mkt=exo"
-    ]
-
-    with st.spinner("Fetching data..."):
-        data = load_data(urls)
+    refresher = get_refresher()
+    snapshots = get_flow_snapshots()
+    data, fetched_at = refresher.latest()
+    if data is None:
+        with st.spinner("Fetching data..."):
+            refresher.wait_ready(FIRST_SNAPSHOT_WAIT)
+        data, fetched_at = refresher.latest()
+    if data is None:
+        st.warning("CBOE data is not available yet; it is still being downloaded in the background.")
+        data = pd.DataFrame()
+    else:
+        age = (datetime.now() - fetched_at).total_seconds()
+        st.caption(f"CBOE data as of {fetched_at:%H:%M:%S} ({age:.0f}s old)")
+        if refresher.last_error:
+            st.warning(f"Latest refresh failed, showing the previous snapshot: {refresher.last_error}")
+        elif data.attrs.get('missing_feeds'):
+            st.warning(f"Some CBOE feeds failed this refresh and are missing: {', '.join(data.attrs['missing_feeds'])}")
 
     if not data.empty:
-        tab1, tab2, tab3 = st.tabs(["Risk Reversal Trades", "Whale Transactions", "Options Flow Analysis"])
+        tab1, tab2, tab3, tab4 = st.tabs(["Risk Reversal Trades", "Whale Transactions", "Options Flow Analysis", "Flow Deltas"])
 
         with tab1:
             if risk_reversal_option:
                 st.subheader("Risk Reversal Trades")
                 risk_reversal_data = filter_risk_reversal(data, exclude_symbols=excluded_symbols)
+                risk_reversal_data = with_greeks(
+                    risk_reversal_data.assign(**{'Call/Put': risk_reversal_data['Type'].str[0]})
+                ).drop(columns='Call/Put')
                 st.dataframe(risk_reversal_data)
 
                 csv = risk_reversal_data.to_csv(index=False)
@@ -181,7 +268,10 @@ def run():
         with tab2:
             if whale_option:
                 st.subheader("Whale Transactions")
-                summary = summarize_transactions(data, whale_filter=True, exclude_symbols=excluded_symbols)
+                summary = with_greeks(summarize_transactions(data, whale_filter=True, exclude_symbols=excluded_symbols))
+                rank_by = st.radio("Rank by", ["Transaction Value", "Delta Notional"], horizontal=True)
+                if rank_by == "Delta Notional" and not summary.empty:
+                    summary = summary.sort_values('Delta Notional', key=abs, ascending=False, ignore_index=True)
                 st.dataframe(summary)
 
                 csv = summary.to_csv(index=False)
@@ -197,23 +287,18 @@ def run():
         with tab3:
             st.subheader("Options Flow Analysis")
 
-            symbols = sorted(data['Symbol'].unique())
-            selected_symbol = st.selectbox("Select Symbol to Analyze", symbols)
-            symbol_data = data[data['Symbol'] == selected_symbol]
+            cube = get_flow_cube(data, fetched_at)
+            selected_symbol = st.selectbox("Select Symbol to Analyze", cube.symbols)
 
-            strike_prices = sorted(symbol_data['Strike Price'].unique())
+            strike_prices = cube.strikes(selected_symbol)
             selected_strike_price = st.selectbox("Select Strike Price (Optional)", [None] + strike_prices)
 
             call_put_options = ['C', 'P']
             selected_call_put = st.radio("Select Call/Put (Optional)", [None] + call_put_options, horizontal=True)
 
-            if selected_strike_price:
-                symbol_data = symbol_data[symbol_data['Strike Price'] == selected_strike_price]
-
-            if selected_call_put:
-                symbol_data = symbol_data[symbol_data['Call/Put'] == selected_call_put]
-
-            summary = summarize_transactions(symbol_data, whale_filter=False, exclude_symbols=excluded_symbols)
+            summary = cube.summary(selected_symbol, selected_strike_price, selected_call_put)
+            if selected_symbol in excluded_symbols:
+                summary = summary.iloc[0:0]
             st.dataframe(summary)
 
             csv = summary.to_csv(index=False)
@@ -224,12 +309,30 @@ def run():
                 mime="text/csv"
             )
 
+        with tab4:
+            st.subheader("Flow Deltas")
+            view = st.radio("Window", ["Since last refresh", "Rolling window"], horizontal=True)
+            if view == "Since last refresh":
+                deltas = snapshots.since_last()
+            else:
+                window = st.number_input("Window (minutes)", min_value=1, max_value=120, value=15, step=1)
+                deltas = snapshots.rolling(window)
+            if excluded_symbols:
+                deltas = deltas[~deltas['Symbol'].isin(excluded_symbols)]
+
+            last_update = snapshots.last_update()
+            if last_update is None:
+                st.info("Deltas appear once a later refresh sees new trades.")
+            else:
+                st.caption(f"Last change seen at {last_update:%H:%M:%S}")
+                st.dataframe(deltas)
+
     st.write("This is the Flow Summary application.")
 
     if auto_refresh:
+        # Reruns only re-read the refresher's latest snapshot; downloads stay on its own schedule
         st.write(f"Auto-refreshing every {refresh_interval} seconds...")
-        time.sleep(refresh_interval)
-        st.experimental_rerun()
+        st_autorefresh(interval=refresh_interval * 1000, key="flow_summary_refresh")
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,72 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Tuple
+import pandas as pd
+import yfinance as yf
+
+CHAIN_TTL = 120  # seconds a downloaded chain, expiration list or spot is reused
+CHAIN_WORKERS = 8  # concurrent Yahoo requests
+
+class OptionChainCache:
+    """Yahoo option chains keyed by (ticker, expiration), reused for ttl seconds.
+
+    Misses are downloaded on a bounded thread pool; concurrent requests for the same key
+    share one in-flight download, and failed downloads are not cached.
+    """
+
+    def __init__(self, ttl: float = CHAIN_TTL, max_workers: int = CHAIN_WORKERS):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='option-chain')
+        self._entries: Dict[tuple, Tuple[Future, float]] = {}
+        self._lock = threading.Lock()
+
+    def expirations(self, symbol: str) -> Tuple[str, ...]:
+        return self._submit(('expirations', symbol), lambda: tuple(yf.Ticker(symbol).options)).result()
+
+    def spot(self, symbol: str) -> float:
+        """Last close over the past 5 days."""
+        return self._submit(('spot', symbol), lambda: _last_close(symbol)).result()
+
+    def chain(self, symbol: str, expiration: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """(calls, puts) for one expiration."""
+        return self._chain_future(symbol, expiration).result()
+
+    def chains(self, symbol: str, expirations: Iterable[str]) -> Dict[str, object]:
+        """{expiration: (calls, puts) or the exception raised}, fetched in one parallel round trip."""
+        futures = {expiration: self._chain_future(symbol, expiration) for expiration in expirations}
+        results = {}
+        for expiration, future in futures.items():
+            try:
+                results[expiration] = future.result()
+            except Exception as e:
+                results[expiration] = e
+        return results
+
+    def _chain_future(self, symbol: str, expiration: str) -> Future:
+        def download():
+            opt = yf.Ticker(symbol).option_chain(expiration)
+            return opt.calls, opt.puts
+        return self._submit(('chain', symbol, expiration), download)
+
+    def _submit(self, key: tuple, download: Callable[[], object]) -> Future:
+        now = time.monotonic()
+        with self._lock:
+            # Drop expired and failed entries for every key, so tickers nobody asks for again don't pile up
+            self._entries = {k: (future, fetched_at) for k, (future, fetched_at) in self._entries.items()
+                             if now - fetched_at <= self.ttl and not _failed(future)}
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0]
+            future = self._executor.submit(download)
+            self._entries[key] = (future, now)
+            return future
+
+def _failed(future: Future) -> bool:
+    return future.done() and future.exception() is not None
+
+def _last_close(symbol: str) -> float:
+    hist = yf.Ticker(symbol).history(period='5d')
+    if hist.empty:
+        raise ValueError(f"No price data available for {symbol}")
+    return hist['Close'].iloc[-1]
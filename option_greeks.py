@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+RISK_FREE_RATE = 0.05
+MIN_VOL = 1e-4
+MAX_VOL = 5.0
+IV_TOLERANCE = 1e-6  # absolute price error accepted by the solver
+MAX_ITERATIONS = 60
+MIN_YEARS = 1 / (365 * 24)  # floor time to expiry at one hour so same-day contracts stay finite
+MARKET_CLOSE = pd.Timedelta(hours=16)
+
+SQRT_2PI = np.sqrt(2 * np.pi)
+
+def norm_pdf(x):
+    return np.exp(-0.5 * x * x) / SQRT_2PI
+
+def norm_cdf(x):
+    """Standard normal CDF (Abramowitz & Stegun 26.2.17, |error| < 7.5e-8) without scipy."""
+    x = np.asarray(x, dtype=np.float64)
+    t = 1.0 / (1.0 + 0.2316419 * np.abs(x))
+    poly = t * (0.319381530 + t * (-0.356563782 + t * (1.781477937 + t * (-1.821255978 + t * 1.330274429))))
+    upper = norm_pdf(x) * poly
+    return np.where(x >= 0, 1.0 - upper, upper)
+
+def _d1_d2(S, K, T, r, sigma):
+    vol_sqrt_t = sigma * np.sqrt(T)
+    d1 = (np.log(S / K) + (r + 0.5 * sigma * sigma) * T) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+def bs_price(S, K, T, r, sigma, is_call):
+    d1, d2 = _d1_d2(S, K, T, r, sigma)
+    discount = K * np.exp(-r * T)
+    call = S * norm_cdf(d1) - discount * norm_cdf(d2)
+    # Put from parity keeps one code path for both sides
+    return np.where(is_call, call, call - S + discount)
+
+def bs_vega(S, K, T, r, sigma):
+    d1, _ = _d1_d2(S, K, T, r, sigma)
+    return S * norm_pdf(d1) * np.sqrt(T)
+
+def bs_delta(S, K, T, r, sigma, is_call):
+    d1, _ = _d1_d2(S, K, T, r, sigma)
+    return np.where(is_call, norm_cdf(d1), norm_cdf(d1) - 1.0)
+
+def bs_gamma(S, K, T, r, sigma):
+    d1, _ = _d1_d2(S, K, T, r, sigma)
+    return norm_pdf(d1) / (S * sigma * np.sqrt(T))
+
+def _price_and_vega(S, K, T, r, sigma, is_call):
+    sqrt_t = np.sqrt(T)
+    vol_sqrt_t = sigma * sqrt_t
+    d1 = (np.log(S / K) + (r + 0.5 * sigma * sigma) * T) / vol_sqrt_t
+    discount = K * np.exp(-r * T)
+    call = S * norm_cdf(d1) - discount * norm_cdf(d1 - vol_sqrt_t)
+    return np.where(is_call, call, call - S + discount), S * norm_pdf(d1) * sqrt_t
+
+def implied_volatility(price, S, K, T, is_call, r=RISK_FREE_RATE):
+    """Black-Scholes implied volatility for whole arrays of contracts at once; scalars give a 1-element array.
+
+    Newton steps on vega, safeguarded by a per-contract [MIN_VOL, MAX_VOL] bracket: any step
+    that leaves the bracket, or stalls on a flat vega, falls back to bisection. Prices outside
+    the no-arbitrage bounds, or needing a vol outside the bracket, get NaN.
+    """
+    price, S, K, T = (np.asarray(a, dtype=np.float64) for a in np.broadcast_arrays(*np.atleast_1d(price, S, K, T)))
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), price.shape)
+    T = np.maximum(T, MIN_YEARS)
+
+    discount = K * np.exp(-r * T)
+    lower_bound = np.where(is_call, np.maximum(S - discount, 0.0), np.maximum(discount - S, 0.0))
+    upper_bound = np.where(is_call, S, discount)
+    with np.errstate(invalid='ignore'):
+        valid = np.isfinite(price) & np.isfinite(S) & (S > 0) & (K > 0) & (price > lower_bound) & (price < upper_bound)
+
+    sigma = np.full(price.shape, np.nan)
+    active = np.flatnonzero(valid)
+    s, k, t, c, target = S[active], K[active], T[active], is_call[active], price[active]
+    low = np.full(active.size, MIN_VOL)
+    high = np.full(active.size, MAX_VOL)
+    # Brenner-Subrahmanyam start, clipped into the bracket
+    vol = np.clip(np.sqrt(2 * np.pi / t) * target / s, MIN_VOL * 2, MAX_VOL / 2)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for _ in range(MAX_ITERATIONS):
+            if active.size == 0:
+                break
+            model, vega = _price_and_vega(s, k, t, r, vol, c)
+            error = model - target
+            done = np.abs(error) < IV_TOLERANCE
+            sigma[active[done]] = vol[done]
+
+            # Price rises with vol, so the sign of the error moves one end of the bracket
+            above = error > 0
+            high = np.where(above, vol, high)
+            low = np.where(above, low, vol)
+            newton = vol - error / vega
+            inside = np.isfinite(newton) & (newton > low) & (newton < high)
+            vol = np.where(inside, newton, 0.5 * (low + high))
+
+            # Retire converged contracts, and leave NaN for those squeezed against a bracket edge
+            pinned = (high - low < IV_TOLERANCE) & ((low <= MIN_VOL) | (high >= MAX_VOL))
+            keep = ~(done | pinned)
+            active, s, k, t, c, target = active[keep], s[keep], k[keep], t[keep], c[keep], target[keep]
+            low, high, vol = low[keep], high[keep], vol[keep]
+
+    # Anything left after MAX_ITERATIONS is within the final bracket; keep the estimate
+    sigma[active] = vol
+    return sigma
+
+def years_to_expiry(expiration, now=None):
+    """Year fractions from now to each expiration's 16:00 close, floored at MIN_YEARS."""
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    expiry = pd.DatetimeIndex(pd.to_datetime(expiration)).normalize() + MARKET_CLOSE
+    seconds = (expiry - now).total_seconds().to_numpy(np.float64)
+    return np.maximum(seconds / (365 * 86400), MIN_YEARS)
+
+def add_greeks(df, spots, r=RISK_FREE_RATE, now=None):
+    """Return df with Spot, IV, Delta and Delta Notional columns for CBOE-style rows.
+
+    spots maps Symbol to the underlying price; contracts without one get NaN.
+    Delta Notional is signed: delta * spot * volume * 100.
+    """
+    # Mapping a categorical Symbol only touches its categories
+    spot = df['Symbol'].map(spots).to_numpy(np.float64)
+    strike = df['Strike Price'].to_numpy(np.float64)
+    price = np.round(df['Last Price'].to_numpy(np.float64), 4)
+    is_call = (df['Call/Put'] == 'C').to_numpy(bool)
+    T = years_to_expiry(df['Expiration'], now)
+
+    iv = implied_volatility(price, spot, strike, T, is_call, r)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta = bs_delta(spot, strike, T, r, iv, is_call)
+    return df.assign(**{
+        'Spot': spot,
+        'IV': iv,
+        'Delta': delta,
+        'Delta Notional': delta * spot * df['Volume'].to_numpy(np.float64) * 100,
+    })
@@ -1,8 +1,8 @@
 import pandas as pd
 import requests
-from io import StringIO
 from datetime import datetime
 import streamlit as st
+from cboe_feed import read_options_csv
 
 def fetch_data(url):
     try:
@@ -10,19 +10,8 @@ def fetch_data(url):
         response = requests.get(url)
         response.raise_for_status()  # Raise an error if the request fails
         
-        # Read the CSV content into a pandas DataFrame
-        csv_data = StringIO(response.text)
-        df = pd.read_csv(csv_data)
-
-        # Filter out records with Volume less than 400
-        df = df[df['Volume'] >= 100]
-
-        # Convert Expiration to datetime and filter out records with current date
-        df['Expiration'] = pd.to_datetime(df['Expiration'])
-        current_date = datetime.now().date()
-        df = df[df['Expiration'].dt.date != current_date]
-
-        return df
+        # Parse the raw bytes with a fixed schema, dropping Volume < 100 and today's expiration as it reads
+        return read_options_csv(response.content, exclude_expiration=datetime.now().date())
     except Exception as e:
         st.error(f"Error fetching or processing data: {e}")
         return pd.DataFrame()
@@ -41,7 +30,7 @@ def summarize_flows(df, symbol, call_put=None, expiration=None):
     
     # Summarize by expiration, strike price, call/put, and total volume
     summary = (
-        filtered_df.groupby(['Symbol', 'Expiration', 'Strike Price', 'Call/Put'])
+        filtered_df.groupby(['Symbol', 'Expiration', 'Strike Price', 'Call/Put'], observed=True)
         .agg({'Volume': 'sum'})
         .reset_index()
     )
@@ -1,26 +1,362 @@
 import sqlite3
+import datetime
+import threading
+import queue
+import time
+import atexit
+from contextlib import contextmanager
 import pandas as pd
 
-def store_data(df, table_name='alerts'):
-    conn = sqlite3.connect('alerts.db')
-    c = conn.cursor()
-    
-    # Create table if not exists
-    c.execute(f'''CREATE TABLE IF NOT EXISTS {table_name}
-                  (symbol text, date text, signal text, alert_price real, today_price real, return_alert real)''')
-    
-    # Convert DataFrame to a list of tuples for bulk insert
-    data = [tuple(row) for row in df[['Symbol', 'Alert Date', 'Signal', 'Alert Date Close', 'Today Close', 'Return Alert(%)']].itertuples(index=False, name=None)]
-    
-    # Insert data
-    c.executemany(f'INSERT OR REPLACE INTO {table_name} VALUES (?, ?, ?, ?, ?, ?)', data)
-    conn.commit()
-    
-    # Close connection
-    conn.close()
-
-def fetch_data(table_name='alerts'):
-    conn = sqlite3.connect('alerts.db')
-    df = pd.read_sql_query(f"SELECT * FROM {table_name} ORDER BY date DESC", conn)
-    conn.close()
+DB_PATH = 'alerts.db'
+RETENTION_DAYS = 365  # price alerts older than this are pruned on write
+CHUNK_SIZE = 5000  # rows per DataFrame when streaming query results
+WRITE_BATCH_ROWS = 5000  # write-behind flushes once this many rows are pending
+WRITE_INTERVAL = 2.0  # ... or once the oldest pending row has waited this many seconds
+
+ALERT_COLUMNS = ['Signal', 'Alert Date', 'Symbol', 'Alert Date Close', 'Today Close', 'Return Alert(%)']
+
+# One long-lived writer connection per database file, shared by every Streamlit session thread;
+# reads go through per-thread connections so they never queue behind the writer's lock
+_connections = {}
+_lock = threading.RLock()
+_readers = threading.local()
+
+def get_connection(db_path=DB_PATH):
+    """Return the shared writer connection for db_path, opening it once in WAL mode."""
+    with _lock:
+        conn = _connections.get(db_path)
+        if conn is None:
+            conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            # WAL lets the read connections proceed while the writer commits
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            init_alert_store(conn)
+            init_email_store(conn)
+            _connections[db_path] = conn
+        return conn
+
+@contextmanager
+def transaction(db_path=DB_PATH):
+    """Serialize use of the shared connection and commit everything in the block at once."""
+    conn = get_connection(db_path)
+    with _lock:
+        with conn:
+            yield conn
+
+def read_connection(db_path=DB_PATH):
+    """Return this thread's read connection for db_path; it takes no lock shared with the writer."""
+    connections = getattr(_readers, 'connections', None)
+    if connections is None:
+        connections = _readers.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        if db_path not in _connections:
+            get_connection(db_path)  # create the database and schema on first use
+        conn = connections[db_path] = sqlite3.connect(db_path, timeout=5)
+    return conn
+
+def close_connections():
+    with _lock:
+        for conn in _connections.values():
+            conn.close()
+        _connections.clear()
+    for conn in getattr(_readers, 'connections', {}).values():
+        conn.close()
+    _readers.connections = {}
+
+def init_alert_store(conn):
+    # One table for every scan; (scan, date, symbol) keys per-scan pages sorted by date
+    conn.execute('''CREATE TABLE IF NOT EXISTS price_alerts
+                    (scan text, date text, symbol text, alert_price real, today_price real, return_alert real,
+                     PRIMARY KEY (scan, date, symbol))''')
+    # Covering index for cross-scan (date, symbol) grouping such as high conviction
+    conn.execute('CREATE INDEX IF NOT EXISTS price_alerts_date_symbol_idx ON price_alerts (date, symbol, scan)')
+    conn.execute('CREATE INDEX IF NOT EXISTS price_alerts_symbol_idx ON price_alerts (symbol, date)')
+    migrate_keyword_tables(conn)
+
+def migrate_keyword_tables(conn):
+    """Fold the old one-table-per-keyword layout ("<keyword>_alerts", "alerts") into price_alerts."""
+    legacy_columns = ['symbol', 'date', 'signal', 'alert_price', 'today_price', 'return_alert']
+    tables = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    with conn:
+        for name in tables:
+            if name != 'alerts' and not name.endswith('_alerts'):
+                continue
+            columns = [column[1] for column in conn.execute(f'PRAGMA table_info("{name}")')]
+            if columns != legacy_columns:
+                continue
+            # Later rows win, matching the last poll that wrote them
+            conn.execute(f'''INSERT OR REPLACE INTO price_alerts
+                             SELECT signal, date, symbol, alert_price, today_price, return_alert
+                             FROM "{name}" ORDER BY rowid''')
+            conn.execute(f'DROP TABLE "{name}"')
+
+def alert_rows(df):
+    """Convert a price DataFrame to (scan, date, symbol, alert_price, today_price, return_alert) tuples."""
+    rows = df[ALERT_COLUMNS].copy()
+    rows['Alert Date'] = pd.to_datetime(rows['Alert Date']).dt.strftime('%Y-%m-%d')
+    rows = rows.astype(object).where(rows.notna(), None)
+    return list(rows.itertuples(index=False, name=None))
+
+def store_data(df, retention_days=RETENTION_DAYS):
+    """Upsert price alerts for any number of scans (taken from the Signal column) in one transaction."""
+    cutoff = (datetime.date.today() - datetime.timedelta(days=retention_days)).isoformat()
+    with transaction() as conn:
+        conn.executemany('''INSERT INTO price_alerts VALUES (?, ?, ?, ?, ?, ?)
+                            ON CONFLICT (scan, date, symbol) DO UPDATE SET
+                                alert_price = excluded.alert_price,
+                                today_price = excluded.today_price,
+                                return_alert = excluded.return_alert''', alert_rows(df))
+        conn.execute('DELETE FROM price_alerts WHERE date < ?', (cutoff,))
+
+class AlertWriter(threading.Thread):
+    """Write-behind persistence: callers enqueue price frames and return immediately.
+
+    The writer thread coalesces queued frames and commits them through store_data once
+    batch_rows are pending or the oldest has waited flush_interval seconds.
+    """
+
+    def __init__(self, batch_rows=WRITE_BATCH_ROWS, flush_interval=WRITE_INTERVAL, retention_days=RETENTION_DAYS):
+        super().__init__(name='alert-writer', daemon=True)
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.flushes = 0
+        self.rows_written = 0
+        self.pending_rows = 0
+        self.last_flush_seconds = None
+        self.last_error = None
+
+    def submit(self, df):
+        if not df.empty:
+            self._queue.put(df)
+
+    def flush(self, timeout=None, sync=True):
+        """Block until everything submitted so far is written; return True only if it all committed.
+
+        Returns False on timeout, or when a write or checkpoint failed and rows are still pending.
+        With sync, also checkpoint the WAL into the database file so the rows are on disk,
+        not just in the log that synchronous=NORMAL leaves unsynced.
+        """
+        return self._command('flush', sync, timeout)
+
+    def stop(self, timeout=None):
+        """Make a final write attempt and end the thread; return True only if nothing was lost."""
+        return self._command('stop', True, timeout)
+
+    def _command(self, command, sync, timeout):
+        if not self.is_alive():
+            return self.pending_rows == 0 and self._queue.empty()
+        done = threading.Event()
+        result = []
+        self._queue.put((command, sync, done, result))
+        return done.wait(timeout) and result[0]
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'pending_rows': self.pending_rows,
+                'flushes': self.flushes,
+                'rows_written': self.rows_written,
+                'last_flush_seconds': self.last_flush_seconds,
+                'last_error': self.last_error,
+            }
+
+    def run(self):
+        pending = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, pd.DataFrame):
+                pending.append(item)
+                with self._stats_lock:
+                    self.pending_rows += len(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if self.pending_rows < self.batch_rows:
+                    continue
+
+            if pending and self._write(pending):
+                pending, deadline = [], None
+            elif pending:
+                # Keep the rows and retry after another interval
+                deadline = time.monotonic() + self.flush_interval
+
+            if isinstance(item, tuple):
+                command, sync, done, result = item
+                ok = not pending
+                try:
+                    if sync and ok:
+                        with transaction() as conn:
+                            busy, log_frames, checkpointed = conn.execute('PRAGMA wal_checkpoint(FULL)').fetchone()
+                        # A reader pinning an old snapshot can stop the checkpoint short of the database file
+                        if busy or checkpointed < log_frames:
+                            raise sqlite3.OperationalError(
+                                f"WAL checkpoint incomplete: {checkpointed} of {log_frames} frames, busy={busy}")
+                        with self._stats_lock:
+                            self.last_error = None
+                except Exception as e:
+                    ok = False
+                    with self._stats_lock:
+                        self.last_error = str(e)
+                finally:
+                    result.append(ok)
+                    done.set()
+                if command == 'stop':
+                    return
+
+    def _write(self, frames):
+        """Commit the pending frames; on any error record it and return False so the rows are retried."""
+        started = time.perf_counter()
+        try:
+            # Later frames win for the same (scan, date, symbol), as the upsert would
+            df = pd.concat(frames, ignore_index=True).drop_duplicates(['Signal', 'Alert Date', 'Symbol'], keep='last')
+            store_data(df, self.retention_days)
+        except Exception as e:
+            with self._stats_lock:
+                self.last_error = str(e)
+            return False
+        with self._stats_lock:
+            self.flushes += 1
+            self.rows_written += len(df)
+            self.pending_rows = 0
+            self.last_flush_seconds = time.perf_counter() - started
+            self.last_error = None
+        return True
+
+_writer = None
+
+def get_writer():
+    """Return the process-wide AlertWriter, starting it on first use and flushing it at exit."""
+    global _writer
+    with _lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = AlertWriter()
+            _writer.start()
+            atexit.register(_writer.stop)
+        return _writer
+
+def build_query(since=None, scans=None, symbols=None, select='*'):
+    """Return (sql, params) selecting alerts on or after since, restricted to scans and symbols."""
+    clauses, params = [], []
+    if since is not None:
+        clauses.append('date >= ?')
+        params.append(pd.Timestamp(since).strftime('%Y-%m-%d'))
+    if scans:
+        clauses.append(f"scan IN ({', '.join('?' * len(scans))})")
+        params.extend(scans)
+    if symbols:
+        clauses.append(f"symbol IN ({', '.join('?' * len(symbols))})")
+        params.extend(symbols)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+    return f"SELECT {select} FROM price_alerts{where}", params
+
+def fetch_data(since=None, scans=None, symbols=None, limit=None, offset=0):
+    """Load one page of alerts, newest first, with filters evaluated in SQLite."""
+    sql, params = build_query(since, scans, symbols)
+    sql += ' ORDER BY date DESC, symbol'
+    if limit is not None:
+        sql += ' LIMIT ? OFFSET ?'
+        params += [limit, offset]
+    df = pd.read_sql_query(sql, read_connection(), params=params)
     return df
+
+def count_data(since=None, scans=None, symbols=None):
+    sql, params = build_query(since, scans, symbols, select='COUNT(*)')
+    return read_connection().execute(sql, params).fetchone()[0]
+
+def iter_data(since=None, scans=None, symbols=None, chunksize=CHUNK_SIZE):
+    """Stream matching alerts as DataFrames of at most chunksize rows, newest first.
+
+    Uses a dedicated connection so a long export never ties up this thread's read connection.
+    """
+    sql, params = build_query(since, scans, symbols)
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        yield from pd.read_sql_query(sql + ' ORDER BY date DESC, symbol', conn, params=params, chunksize=chunksize)
+    finally:
+        conn.close()
+
+def fetch_high_conviction(since=None, exclude_scans=None, min_scans=2):
+    """Symbols flagged by at least min_scans distinct scans on the same date, in one indexed query."""
+    clauses, params = [], []
+    if since is not None:
+        clauses.append('date >= ?')
+        params.append(pd.Timestamp(since).strftime('%Y-%m-%d'))
+    if exclude_scans:
+        clauses.append(f"scan NOT IN ({', '.join('?' * len(exclude_scans))})")
+        params.extend(exclude_scans)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+    # (scan, date, symbol) is the key, so each row is already one distinct scan for the pair
+    sql = f'''SELECT date, symbol, group_concat(scan, ', ') AS scans
+              FROM price_alerts{where}
+              GROUP BY date, symbol
+              HAVING COUNT(*) >= ?
+              ORDER BY date DESC, symbol'''
+    df = pd.read_sql_query(sql, read_connection(), params=params + [min_scans])
+    return df
+
+def init_email_store(conn):
+    # Per-mailbox high-water mark; UIDs are only meaningful for one UIDVALIDITY
+    conn.execute('''CREATE TABLE IF NOT EXISTS mailbox_sync
+                    (account text, mailbox text, uidvalidity integer, last_uid integer, synced_since text,
+                     PRIMARY KEY (account, mailbox))''')
+    # One row per symbol added to a scan by an alert email
+    conn.execute('''CREATE TABLE IF NOT EXISTS email_alert_symbols
+                    (account text, mailbox text, uid integer, symbol text, scan text, email_date text,
+                     PRIMARY KEY (account, mailbox, uid, symbol, scan))''')
+    # Older stores kept raw bodies; drop them and force a resync into the parsed table
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'email_alerts'").fetchone():
+        with conn:
+            conn.execute('DROP TABLE email_alerts')
+            conn.execute('DELETE FROM mailbox_sync')
+
+def get_sync_state(account, mailbox='inbox'):
+    """Return (uidvalidity, last_uid, synced_since) for a mailbox, or (None, 0, None) if never synced."""
+    row = read_connection().execute('SELECT uidvalidity, last_uid, synced_since FROM mailbox_sync WHERE account = ? AND mailbox = ?',
+                                    (account, mailbox)).fetchone()
+    if row is None:
+        return None, 0, None
+    uidvalidity, last_uid, synced_since = row
+    return uidvalidity, last_uid, datetime.date.fromisoformat(synced_since) if synced_since else None
+
+def save_email_alerts(account, mailbox, uidvalidity, last_uid, synced_since, rows):
+    """Merge (uid, symbol, scan, email_datetime) rows and advance the high-water mark in one transaction.
+
+    A changed UIDVALIDITY invalidates every stored UID, so the mailbox is cleared first.
+    """
+    with transaction() as conn:
+        row = conn.execute('SELECT uidvalidity, last_uid FROM mailbox_sync WHERE account = ? AND mailbox = ?',
+                           (account, mailbox)).fetchone()
+        if row is not None and row[0] != uidvalidity:
+            conn.execute('DELETE FROM email_alert_symbols WHERE account = ? AND mailbox = ?', (account, mailbox))
+        elif row is not None:
+            # Sessions and the IDLE listener write concurrently; never move the mark backwards
+            last_uid = max(last_uid, row[1])
+        conn.executemany('INSERT OR REPLACE INTO email_alert_symbols VALUES (?, ?, ?, ?, ?, ?)',
+                         [(account, mailbox, uid, symbol, scan, email_datetime.isoformat())
+                          for uid, symbol, scan, email_datetime in rows])
+        conn.execute('INSERT OR REPLACE INTO mailbox_sync VALUES (?, ?, ?, ?, ?)',
+                     (account, mailbox, uidvalidity, last_uid, synced_since.isoformat() if synced_since else None))
+
+def load_email_alerts(account, mailbox='inbox', since_date=None, before_date=None):
+    """Return stored (symbol, scan, email_datetime) alerts, oldest first, within [since_date, before_date)."""
+    query = 'SELECT symbol, scan, email_date FROM email_alert_symbols WHERE account = ? AND mailbox = ?'
+    params = [account, mailbox]
+    if since_date is not None:
+        # ISO timestamps start with the date, so a string comparison filters by day
+        query += ' AND email_date >= ?'
+        params.append(since_date.isoformat())
+    if before_date is not None:
+        query += ' AND email_date < ?'
+        params.append(before_date.isoformat())
+    rows = read_connection().execute(query + ' ORDER BY email_date, uid', params).fetchall()
+    return [(symbol, scan, datetime.datetime.fromisoformat(email_date)) for symbol, scan, email_date in rows]
@@ -1,21 +1,12 @@
 import pandas as pd
 from datetime import datetime
 import streamlit as st
+from cboe_feed import read_options_csv
 
 def load_data(file):
     try:
-        # Read the uploaded CSV content into a pandas DataFrame
-        df = pd.read_csv(file)
-
-        # Filter out records with Volume less than 100
-        df = df[df['Volume'] >= 100]
-
-        # Convert Expiration to datetime and filter out records with current date
-        df['Expiration'] = pd.to_datetime(df['Expiration'])
-        current_date = datetime.now().date()
-        df = df[df['Expiration'].dt.date != current_date]
-
-        return df
+        # Parse the uploaded bytes with a fixed schema, dropping Volume < 100 and today's expiration as it reads
+        return read_options_csv(file, exclude_expiration=datetime.now().date())
     except Exception as e:
         st.error(f"Error processing data: {e}")
         return pd.DataFrame()
@@ -34,7 +25,7 @@ def summarize_flows(df, symbol, call_put=None, expiration=None):
     
     # Summarize by expiration, strike price, call/put, and total volume
     summary = (
-        filtered_df.groupby(['Symbol', 'Expiration', 'Strike Price', 'Call/Put'])
+        filtered_df.groupby(['Symbol', 'Expiration', 'Strike Price', 'Call/Put'], observed=True)
         .agg({'Volume': 'sum'})
         .reset_index()
     )
@@ -0,0 +1,498 @@
+import imaplib
+import email
+import email.header
+import re
+import time
+import select
+import ssl
+import threading
+import datetime
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from email.message import Message
+from html import unescape
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+import pandas as pd
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+IMAP_HOST = 'imap.gmail.com'
+FETCH_BATCH_SIZE = 200  # UIDs per FETCH command
+MARKET_TZ = ZoneInfo('America/New_York')
+IDLE_TIMEOUT = 25 * 60  # servers may drop IDLE after 29 minutes (RFC 2177)
+RECONNECT_DELAY = 30  # seconds
+MAX_BUFFERED_ALERTS = 5000
+BACKFILL_WORKERS = 4  # concurrent IMAP sessions; Gmail allows 15 per account
+
+# Only the headers needed to route a message and decode its TEXT section
+HEADER_FIELDS = 'BODY.PEEK[HEADER.FIELDS (SUBJECT MIME-VERSION CONTENT-TYPE CONTENT-TRANSFER-ENCODING)]'
+
+UID_PATTERN = re.compile(rb'UID (\d+)')
+STATUS_PATTERN = re.compile(rb'(UIDVALIDITY|UIDNEXT) (\d+)')
+INTERNALDATE_PATTERN = re.compile(rb'INTERNALDATE "\s?(\d{1,2})-(\w{3})-(\d{4}) (\d{2}):(\d{2}):(\d{2}) ([+-])(\d{2})(\d{2})"')
+ALERT_MARKER = 'New symbols:'
+
+# Comments, script/style blocks, tags and entities, matched in one scan of the HTML
+HTML_TOKEN_PATTERN = re.compile(r'<!--.*?-->|<(script|style)\b.*?</\1\s*>|<[^>]*>|&#?\w+;', re.IGNORECASE | re.DOTALL)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+SYMBOL_SEPARATOR_PATTERN = re.compile(r'[\s,]+')
+MONTHS = {month.encode(): i for i, month in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], start=1)}
+
+
+def connect(email_address: str, password: str, retries: int = 3, retry_delay: int = 2) -> imaplib.IMAP4_SSL:
+    """Open an IMAP session with retry logic."""
+    for attempt in range(retries):
+        try:
+            mail = imaplib.IMAP4_SSL(IMAP_HOST)
+            mail.login(email_address, password)
+            return mail
+        except Exception as e:
+            if attempt == retries - 1:
+                raise
+            logger.warning(f"Connection attempt {attempt + 1} failed: {e}")
+            time.sleep(retry_delay)
+
+
+def get_mailbox_state(mail: imaplib.IMAP4, mailbox: str = 'inbox') -> Tuple[int, int]:
+    """Return (UIDVALIDITY, UIDNEXT) for a mailbox without selecting it."""
+    status, data = mail.status(mailbox, '(UIDVALIDITY UIDNEXT)')
+    if status != 'OK':
+        raise imaplib.IMAP4.error(f"STATUS {mailbox} failed: {status}")
+    values = {key.decode(): int(value) for key, value in STATUS_PATTERN.findall(data[0])}
+    return values['UIDVALIDITY'], values['UIDNEXT']
+
+
+def search_alert_uids(mail: imaplib.IMAP4, sender_email: str, start_date=None, min_uid: int = None, before_date=None) -> List[int]:
+    """Run a single UID SEARCH for alerts from the sender, optionally bounded by date and UID."""
+    criteria = ['FROM', f'"{sender_email}"']
+    if start_date is not None:
+        criteria += ['SINCE', start_date.strftime("%d-%b-%Y")]
+    if before_date is not None:
+        criteria += ['BEFORE', before_date.strftime("%d-%b-%Y")]
+    if min_uid is not None:
+        criteria += ['UID', f"{min_uid}:*"]
+    status, data = mail.uid('SEARCH', None, *criteria)
+    if status != 'OK' or not data or not data[0]:
+        return []
+    uids = sorted(int(uid) for uid in data[0].split())
+    if min_uid is not None:
+        # "n:*" always matches the newest message, even when its UID is below n
+        uids = [uid for uid in uids if uid >= min_uid]
+    return uids
+
+
+def uid_ranges(uids: Iterable[int], batch_size: int = FETCH_BATCH_SIZE) -> Iterator[str]:
+    """Yield compact IMAP sequence sets (e.g. '10:25,31') covering at most batch_size UIDs each."""
+    uids = sorted(set(uids))
+    for i in range(0, len(uids), batch_size):
+        batch = uids[i:i + batch_size]
+        parts = []
+        start = prev = batch[0]
+        for uid in batch[1:]:
+            if uid == prev + 1:
+                prev = uid
+                continue
+            parts.append(f"{start}:{prev}" if start != prev else str(start))
+            start = prev = uid
+        parts.append(f"{start}:{prev}" if start != prev else str(start))
+        yield ','.join(parts)
+
+
+def parse_internaldate(match: re.Match) -> datetime.datetime:
+    """Convert an INTERNALDATE match to a market-time datetime without a general-purpose date parser."""
+    day, month, year, hour, minute, second, sign, tz_hours, tz_minutes = match.groups()
+    offset = datetime.timedelta(hours=int(tz_hours), minutes=int(tz_minutes))
+    tz = datetime.timezone(-offset if sign == b'-' else offset)
+    received = datetime.datetime(int(year), MONTHS[month], int(day), int(hour), int(minute), int(second), tzinfo=tz)
+    return received.astimezone(MARKET_TZ)
+
+
+def _iter_fetch_items(data: list) -> Iterator[Tuple[bytes, bytes]]:
+    """Yield (metadata, literal) for each message in a FETCH response.
+
+    Servers may send data items after the literal, so the trailing bytes are folded into the metadata.
+    """
+    meta = literal = None
+    for item in data:
+        if isinstance(item, tuple):
+            if meta is not None:
+                yield meta, literal
+            meta, literal = item
+        elif meta is not None and item:
+            meta += b' ' + item
+    if meta is not None:
+        yield meta, literal
+
+
+def fetch_alert_headers(mail: imaplib.IMAP4, uids: Iterable[int], batch_size: int = FETCH_BATCH_SIZE) -> Iterator[Tuple[int, datetime.datetime, bytes]]:
+    """Fetch INTERNALDATE and the routing headers only, yielding (uid, received_at, header_bytes).
+
+    A FETCH the server rejects raises imaplib.IMAP4.error.
+    """
+    for uid_set in uid_ranges(uids, batch_size):
+        status, data = mail.uid('FETCH', uid_set, f'(INTERNALDATE {HEADER_FIELDS})')
+        if status != 'OK':
+            # Raise rather than skip, so callers never advance their UID mark past unfetched mail
+            raise imaplib.IMAP4.error(f"FETCH {uid_set} failed: {status}")
+        for meta, literal in _iter_fetch_items(data):
+            uid_match = UID_PATTERN.search(meta)
+            date_match = INTERNALDATE_PATTERN.search(meta)
+            if uid_match and date_match:
+                yield int(uid_match.group(1)), parse_internaldate(date_match), literal
+
+
+def fetch_alert_bodies(mail: imaplib.IMAP4, headers: Dict[int, bytes], batch_size: int = FETCH_BATCH_SIZE) -> Iterator[Tuple[int, Message]]:
+    """Fetch BODY.PEEK[TEXT] for the given UIDs and rebuild each message from its fetched headers.
+
+    A FETCH the server rejects raises imaplib.IMAP4.error.
+    """
+    for uid_set in uid_ranges(headers, batch_size):
+        status, data = mail.uid('FETCH', uid_set, '(BODY.PEEK[TEXT])')
+        if status != 'OK':
+            # Raise rather than skip, so callers never advance their UID mark past unfetched mail
+            raise imaplib.IMAP4.error(f"FETCH {uid_set} failed: {status}")
+        for meta, literal in _iter_fetch_items(data):
+            uid_match = UID_PATTERN.search(meta)
+            if uid_match and int(uid_match.group(1)) in headers:
+                uid = int(uid_match.group(1))
+                yield uid, email.message_from_bytes(headers[uid].rstrip(b'\r\n') + b'\r\n\r\n' + literal)
+
+
+def decode_subject(msg: Message) -> str:
+    """Return the decoded Subject header of a message."""
+    raw = msg.get('Subject', '')
+    try:
+        return str(email.header.make_header(email.header.decode_header(raw)))
+    except Exception:
+        return raw
+
+
+def route_by_subject(subject: str, keywords: Iterable[str]) -> List[str]:
+    """Return the keywords contained in the subject (case-insensitive, like IMAP SUBJECT search)."""
+    subject = subject.casefold()
+    return [keyword for keyword in keywords if keyword.casefold() in subject]
+
+
+
+def _replace_html_token(match: re.Match) -> str:
+    token = match.group(0)
+    return unescape(token) if token[0] == '&' else ' '
+
+
+def html_to_text(html: str) -> str:
+    """Strip tags and decode entities without building a DOM; whitespace is collapsed like get_text(' ', strip=True)."""
+    text = HTML_TOKEN_PATTERN.sub(_replace_html_token, html)
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+def html_body_text(html: str) -> str:
+    """Text of an HTML alert, falling back to BeautifulSoup when the fast path finds no alert marker."""
+    text = html_to_text(html)
+    if ALERT_MARKER in text:
+        return text
+    soup = BeautifulSoup(html, "html.parser")
+    return soup.get_text(separator=' ', strip=True)
+
+
+def parse_email_body(msg: Message) -> str:
+    """Return the text of the first text/plain or text/html part of an alert email."""
+    try:
+        part = next((part for part in msg.walk() if part.get_content_type() in ["text/plain", "text/html"]), None)
+        if part is None:
+            return ""
+        body = part.get_payload(decode=True).decode()
+        if part.get_content_type() == "text/html":
+            return html_body_text(body)
+        return body
+    except Exception as e:
+        logger.error(f"Error parsing email body: {e}")
+        return ""
+
+
+@lru_cache(maxsize=8)
+def alert_pattern(scans: Tuple[str, ...]) -> re.Pattern:
+    """Compile one pattern matching "New symbols: ... were added to <scan>" for every scan."""
+    # Longest names first so a scan that prefixes another never shadows it
+    names = '|'.join(re.escape(scan) for scan in sorted(scans, key=len, reverse=True))
+    return re.compile(re.escape(ALERT_MARKER) + r'\s*([\.\w,\s]+?)\s*were added to\s*(' + names + ')')
+
+
+def extract_alerts(body: str, email_datetime: datetime.datetime, scans: Iterable[str]) -> List[Tuple[str, str, datetime.datetime]]:
+    """Scan a body once and return (symbol, scan, timestamp) for every symbol added to any tracked scan."""
+    alerts = []
+    for symbols, scan in alert_pattern(tuple(scans)).findall(body):
+        for symbol in SYMBOL_SEPARATOR_PATTERN.split(symbols):
+            if symbol:
+                alerts.append((symbol, scan, email_datetime))
+    return alerts
+
+
+def fetch_alerts(mail: imaplib.IMAP4, uids: Iterable[int], scans: Iterable[str], start_date=None) -> List[Tuple[int, str, str, datetime.datetime]]:
+    """Fetch, filter and parse alert emails, returning (uid, symbol, scan, timestamp) rows.
+
+    Headers and INTERNALDATE are fetched first, so the start-date, weekend and subject filters
+    run before any body is downloaded.
+    """
+    scans = list(scans)
+    wanted_headers = {}
+    received_at = {}
+    for uid, email_datetime, header_bytes in fetch_alert_headers(mail, uids):
+        # Skip if email date is before start_date
+        if start_date is not None and email_datetime.date() < start_date:
+            continue
+
+        # Skip weekends
+        if email_datetime.weekday() >= 5:
+            continue
+
+        if route_by_subject(decode_subject(email.message_from_bytes(header_bytes)), scans):
+            wanted_headers[uid] = header_bytes
+            received_at[uid] = email_datetime
+
+    rows = []
+    for uid, msg in fetch_alert_bodies(mail, wanted_headers):
+        # One pass over the body finds every tracked scan, not just the subject's
+        for symbol, scan, email_datetime in extract_alerts(parse_email_body(msg), received_at[uid], scans):
+            rows.append((uid, symbol, scan, email_datetime))
+    return rows
+
+
+def _fetch_alerts_on_new_session(email_address: str, password: str, mailbox: str, uids: List[int],
+                                 scans: List[str], start_date) -> List[Tuple[int, str, str, datetime.datetime]]:
+    mail = connect(email_address, password)
+    try:
+        mail.select(mailbox, readonly=True)
+        return fetch_alerts(mail, uids, scans, start_date)
+    finally:
+        try:
+            mail.logout()
+        except Exception:
+            pass
+
+
+def fetch_alerts_parallel(email_address: str, password: str, uids: Iterable[int], scans: Iterable[str],
+                          start_date=None, mailbox: str = 'inbox',
+                          max_workers: int = BACKFILL_WORKERS) -> List[Tuple[int, str, str, datetime.datetime]]:
+    """Backfill a large UID range by splitting it across a bounded pool of IMAP sessions.
+
+    Each session fetches and parses one contiguous slice; the merged rows are ordered by time, then UID.
+    """
+    uids = sorted(set(uids))
+    scans = list(scans)
+    if not uids:
+        return []
+    workers = max(1, min(max_workers, -(-len(uids) // FETCH_BATCH_SIZE)))
+    slice_size = -(-len(uids) // workers)
+    slices = [uids[i:i + slice_size] for i in range(0, len(uids), slice_size)]
+
+    rows = []
+    with ThreadPoolExecutor(max_workers=len(slices)) as executor:
+        futures = [executor.submit(_fetch_alerts_on_new_session, email_address, password, mailbox, uid_slice, scans, start_date)
+                   for uid_slice in slices]
+        for future in futures:
+            rows.extend(future.result())
+    rows.sort(key=lambda row: (row[3], row[0]))
+    return rows
+
+
+class AlertBuffer:
+    """Thread-safe, bounded buffer of (uid, symbol, scan, timestamp) alerts shared by every session.
+
+    Readers keep the version they last saw and ask for everything appended since.
+    """
+
+    def __init__(self, max_alerts: int = MAX_BUFFERED_ALERTS):
+        self._lock = threading.Lock()
+        self._alerts = []
+        self._base = 0  # version of self._alerts[0]
+        self._max_alerts = max_alerts
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            return self._base + len(self._alerts)
+
+    def extend(self, alerts: Iterable[Tuple[int, str, str, datetime.datetime]]) -> None:
+        with self._lock:
+            self._alerts.extend(alerts)
+            overflow = len(self._alerts) - self._max_alerts
+            if overflow > 0:
+                del self._alerts[:overflow]
+                self._base += overflow
+
+    def since(self, version: int) -> Tuple[list, int]:
+        """Return (alerts appended after version, current version)."""
+        with self._lock:
+            start = max(version - self._base, 0)
+            return self._alerts[start:], self._base + len(self._alerts)
+
+
+class IdleListener(threading.Thread):
+    """Background thread holding an IMAP IDLE session and pushing new alerts into an AlertBuffer.
+
+    on_alerts(uidvalidity, last_uid, rows) is called after each batch, e.g. to persist it.
+    start_state=(uidvalidity, last_uid) resumes from a known high-water mark; otherwise only
+    mail arriving after the listener starts is delivered.
+    """
+
+    def __init__(self, email_address: str, password: str, sender_email: str, scans: Iterable[str],
+                 buffer: Optional[AlertBuffer] = None, mailbox: str = 'inbox',
+                 start_state: Optional[Tuple[int, int]] = None,
+                 on_alerts: Optional[Callable[[int, int, list], None]] = None,
+                 idle_timeout: int = IDLE_TIMEOUT):
+        super().__init__(name='tos-alert-idle', daemon=True)
+        self.email_address = email_address
+        self.password = password
+        self.sender_email = sender_email
+        self.scans = list(scans)
+        self.buffer = buffer if buffer is not None else AlertBuffer()
+        self.mailbox = mailbox
+        self.start_state = start_state
+        self.on_alerts = on_alerts
+        self.idle_timeout = idle_timeout
+        self.last_event = None
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logger.warning(f"IDLE listener disconnected: {e}")
+                self._stop_event.wait(RECONNECT_DELAY)
+
+    def _listen(self) -> None:
+        mail = connect(self.email_address, self.password)
+        try:
+            uidvalidity, uidnext = get_mailbox_state(mail, self.mailbox)
+            mail.select(self.mailbox)
+            if self.start_state and self.start_state[0] == uidvalidity:
+                last_uid = self.start_state[1]
+            else:
+                last_uid = uidnext - 1
+
+            # Catch up on anything that arrived while disconnected, then wait for pushes
+            last_uid = self._deliver_new(mail, uidvalidity, last_uid)
+            while not self._stop_event.is_set():
+                if self._idle(mail):
+                    last_uid = self._deliver_new(mail, uidvalidity, last_uid)
+        finally:
+            try:
+                mail.logout()
+            except Exception:
+                pass
+
+    def _deliver_new(self, mail: imaplib.IMAP4, uidvalidity: int, last_uid: int) -> int:
+        uids = search_alert_uids(mail, self.sender_email, min_uid=last_uid + 1)
+        if not uids:
+            return last_uid
+        rows = fetch_alerts(mail, uids, self.scans)
+        last_uid = max(uids)
+        self.start_state = (uidvalidity, last_uid)
+        self.last_event = time.time()
+        if rows:
+            self.buffer.extend(rows)
+            logger.info(f"IDLE listener received {len(rows)} alerts")
+        if self.on_alerts is not None:
+            try:
+                self.on_alerts(uidvalidity, last_uid, rows)
+            except Exception as e:
+                logger.error(f"Error handling pushed alerts: {e}")
+        return last_uid
+
+    def _idle(self, mail: imaplib.IMAP4) -> bool:
+        """Run one IDLE round; return True when the server reported new mail."""
+        tag = mail._new_tag()
+        mail.send(tag + b' IDLE\r\n')
+        if not mail.readline().startswith(b'+'):
+            raise imaplib.IMAP4.abort("server refused IDLE")
+
+        has_new_mail = False
+        deadline = time.monotonic() + self.idle_timeout
+        # Poll the socket in short steps so stop() is honoured promptly
+        while not has_new_mail and not self._stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # imaplib's reader or TLS may already hold bytes that select() cannot see
+            buffered = _has_buffered_input(mail)
+            readable, _, _ = select.select([mail.sock], [], [], 0 if buffered else min(remaining, 5))
+            if readable or buffered:
+                line = mail.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("connection closed during IDLE")
+                has_new_mail = line.rstrip().endswith(b'EXISTS')
+
+        mail.send(b'DONE\r\n')
+        while True:
+            line = mail.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed while ending IDLE")
+            if line.startswith(tag):
+                break
+            has_new_mail = has_new_mail or line.rstrip().endswith(b'EXISTS')
+        return has_new_mail
+
+
+def _has_buffered_input(mail: imaplib.IMAP4) -> bool:
+    """True when a line can be read without waiting on the socket.
+
+    TLS keeps decrypted bytes in the SSL object, and imaplib's buffered mail.file can hold
+    lines that arrived in the same packet as the last one read; select() sees neither.
+    """
+    if getattr(mail.sock, 'pending', lambda: 0)():
+        return True
+    timeout = mail.sock.gettimeout()
+    # A non-blocking peek returns the reader's buffer, or whatever the socket has right now
+    mail.sock.setblocking(False)
+    try:
+        return bool(mail.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError):
+        return False
+    finally:
+        mail.sock.settimeout(timeout)
+
+
+class HighConvictionIndex:
+    """Incrementally maintained (date, ticker) -> signal set index.
+
+    Alerts are added as they arrive, and keys with two or more signals are tracked separately,
+    so a high-conviction lookup only visits candidates instead of regrouping every alert.
+    """
+
+    def __init__(self):
+        self._signals = defaultdict(set)
+        self._candidates = set()
+
+    def __len__(self) -> int:
+        return len(self._signals)
+
+    def add(self, alerts: Iterable[Tuple[str, str, datetime.datetime]]) -> None:
+        """Index (symbol, scan, timestamp) alerts."""
+        for symbol, scan, email_datetime in alerts:
+            key = (email_datetime.date(), symbol)
+            signals = self._signals[key]
+            signals.add(scan)
+            if len(signals) >= 2:
+                self._candidates.add(key)
+
+    def high_conviction(self, scans: Iterable[str], since_date=None) -> pd.DataFrame:
+        """Tickers with at least two distinct signals from scans on the same date."""
+        scans = set(scans)
+        rows = []
+        for date, ticker in self._candidates:
+            if since_date is not None and date < since_date:
+                continue
+            matched = self._signals[(date, ticker)] & scans
+            if len(matched) >= 2:
+                rows.append((date, ticker, ', '.join(sorted(matched))))
+        df = pd.DataFrame(rows, columns=['Date', 'Ticker', 'Signal'])
+        return df.sort_values(by=['Date', 'Ticker'], ignore_index=True)